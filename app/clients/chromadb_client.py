@@ -1,9 +1,86 @@
 # Import necessary libraries
 from config import settings
+import re
+import threading
 import chromadb
 
+# Namespace names become part of collection and file names, so they are limited to safe characters
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,61}[A-Za-z0-9])?$")
+
 # Create a ChromaDB client
 chromadb_client = chromadb.PersistentClient(path=settings.chroma_db_path)
 
 # Get or create a collection for document embeddings
-collection = chromadb_client.get_or_create_collection(name="document_embeddings")
+collection = chromadb_client.get_or_create_collection(name=settings.chroma_collection_name)
+
+# Collections of the namespaces, the default namespace keeps the original collection
+collections = {settings.default_namespace: collection}
+collections_lock = threading.Lock()
+
+
+def validate_namespace(namespace: str | None) -> str:
+    """
+    Function to check a namespace name, returning the default namespace for None
+    """
+
+    namespace = namespace or settings.default_namespace
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(
+            f"Invalid namespace: {namespace}. Use up to 63 letters, digits, '_' or '-', starting and ending with a letter or digit"
+        )
+
+    return namespace
+
+
+def collection_name(namespace: str) -> str:
+    """
+    Function to build the name of the collection backing a namespace
+    """
+
+    if namespace == settings.default_namespace:
+        return settings.chroma_collection_name
+
+    return f"{settings.chroma_collection_name}__{namespace}"
+
+
+def get_collection(namespace=None):
+    """
+    Function to get or create the collection of a namespace
+    """
+
+    namespace = validate_namespace(namespace)
+
+    with collections_lock:
+        if namespace not in collections:
+            collections[namespace] = chromadb_client.get_or_create_collection(name=collection_name(namespace))
+
+        return collections[namespace]
+
+
+def list_namespaces() -> list[str]:
+    """
+    Function to list the namespaces that have a collection, starting with the default one
+    """
+
+    prefix = f"{settings.chroma_collection_name}__"
+    names = sorted(
+        existing.name[len(prefix):]
+        for existing in chromadb_client.list_collections()
+        if existing.name.startswith(prefix)
+    )
+
+    return [settings.default_namespace, *names]
+
+
+def delete_collection(namespace: str):
+    """
+    Function to drop the whole collection of a namespace
+    """
+
+    namespace = validate_namespace(namespace)
+    if namespace == settings.default_namespace:
+        raise ValueError("The default namespace cannot be dropped")
+
+    with collections_lock:
+        collections.pop(namespace, None)
+        chromadb_client.delete_collection(name=collection_name(namespace))
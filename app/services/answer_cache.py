@@ -0,0 +1,138 @@
+# Import necessary libraries
+import time
+import threading
+import numpy as np
+from config import settings
+
+
+class AnswerCache:
+    """
+    An in-memory semantic cache of generated answers keyed by query embedding
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int):
+        """
+        Initialize the cache with its similarity threshold, TTL and size cap
+        """
+
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        # Separate entries for the short and long answer variants of each set of searched namespaces
+        self.entries = {}
+
+    @staticmethod
+    def normalize(embedding) -> np.ndarray:
+        """
+        Method to L2-normalize an embedding so that a dot product gives the cosine similarity
+        """
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def purge_expired(self, now: float):
+        """
+        Method to drop the entries older than the TTL, must be called with the lock held
+        """
+
+        for key, entries in self.entries.items():
+            self.entries[key] = [entry for entry in entries if now - entry["created_at"] < self.ttl_seconds]
+
+    @staticmethod
+    def make_key(short: bool, namespaces=None, file_name=None) -> tuple:
+        """
+        Method to build the key of the entries shared by the queries of a variant over the same namespaces and document
+        """
+
+        return short, tuple(sorted(namespaces or ())), file_name
+
+    def lookup(self, embedding, short: bool, namespaces=None, file_name=None):
+        """
+        Method to find a cached answer for a query embedding, returning its text chunks or None
+        """
+
+        vector = self.normalize(embedding)
+        now = time.time()
+
+        with self.lock:
+            self.purge_expired(now)
+            entries = self.entries.get(self.make_key(short, namespaces, file_name), [])
+
+            if entries:
+                # Compare the query with every cached query in one vectorized pass
+                matrix = np.stack([entry["embedding"] for entry in entries])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+
+                if similarities[best] >= self.threshold:
+                    entries[best]["last_used"] = now
+                    self.hits += 1
+                    return list(entries[best]["chunks"])
+
+            self.misses += 1
+            return None
+
+    def store(self, embedding, short: bool, chunks: list[str], generation: int, namespaces=None, file_name=None):
+        """
+        Method to cache the answer chunks of a query generated against the given knowledge base generation
+        """
+
+        now = time.time()
+
+        with self.lock:
+            # Skip answers generated before the knowledge base changed
+            if generation != self.generation:
+                return
+
+            self.purge_expired(now)
+            entries = self.entries.setdefault(self.make_key(short, namespaces, file_name), [])
+            entries.append({
+                "embedding": self.normalize(embedding),
+                "chunks": chunks,
+                "created_at": now,
+                "last_used": now
+            })
+
+            # Evict the least recently used entries above the size cap
+            if len(entries) > self.max_entries:
+                entries.sort(key=lambda entry: entry["last_used"], reverse=True)
+                del entries[self.max_entries:]
+
+    def invalidate(self):
+        """
+        Method to drop every cached answer after the knowledge base changes
+        """
+
+        with self.lock:
+            self.generation += 1
+            self.entries = {}
+
+    def stats(self) -> dict:
+        """
+        Method to return the cache size and hit/miss counters
+        """
+
+        with self.lock:
+            total = self.hits + self.misses
+
+            return {
+                "size": sum(len(entries) for entries in self.entries.values()),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# Create the answer cache instance
+answer_cache = AnswerCache(
+    settings.answer_cache_similarity_threshold,
+    settings.answer_cache_ttl_seconds,
+    settings.answer_cache_max_entries
+)
@@ -0,0 +1,154 @@
+# Import necessary libraries
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from config import settings
+
+
+class AudioCache:
+    """
+    A content-addressed cache of synthesized speech stored as WAV files on disk with LRU eviction
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        Initialize the cache directory, the index database and the hit/miss counters
+        """
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS audio ("
+            "key TEXT PRIMARY KEY, "
+            "size INTEGER NOT NULL, "
+            "last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_audio_last_used ON audio (last_used)")
+        self.connection.commit()
+
+        self.remove_legacy_files()
+
+    def remove_legacy_files(self):
+        """
+        Method to drop the gzip files of older versions, which cannot be served with range requests
+        """
+
+        legacy_keys = []
+        for root, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.endswith(".wav.gz"):
+                    os.remove(os.path.join(root, file_name))
+                    legacy_keys.append(file_name.removesuffix(".wav.gz"))
+
+        if legacy_keys:
+            self.connection.executemany("DELETE FROM audio WHERE key = ?", [(key,) for key in legacy_keys])
+            self.connection.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str, voice: str) -> str:
+        """
+        Method to build the cache key from the model, the voice and the text
+        """
+
+        return hashlib.sha256(f"{model}\n{voice}\n{text}".encode("utf-8")).hexdigest()
+
+    def file_path(self, key: str) -> str:
+        """
+        Method to return the path of the audio file of a key
+        """
+
+        return os.path.join(self.directory, key[:2], f"{key}.wav")
+
+    def get_path(self, key: str) -> str | None:
+        """
+        Method to look up the audio file of a key, returning None on a miss
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT key FROM audio WHERE key = ?", (key,)).fetchone()
+            path = self.file_path(key)
+
+            if row is None or not os.path.exists(path):
+                self.misses += 1
+                return None
+
+            self.connection.execute("UPDATE audio SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            self.hits += 1
+
+        return path
+
+    def put(self, key: str, audio_bytes: bytes) -> str:
+        """
+        Method to store the audio of a key and evict the least recently used entries
+        """
+
+        path = self.file_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial file
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as buffer:
+            buffer.write(audio_bytes)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO audio (key, size, last_used) VALUES (?, ?, ?)",
+                (key, os.path.getsize(path), time.time())
+            )
+
+            # Evict the least recently used entries above the size cap, never the new one
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM audio").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self.connection.execute(
+                    "SELECT key, size FROM audio WHERE key != ? ORDER BY last_used ASC", (key,)
+                ).fetchall()
+
+                evicted = []
+                for evicted_key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append(evicted_key)
+                    total -= size
+
+                self.connection.executemany("DELETE FROM audio WHERE key = ?", [(k,) for k in evicted])
+                for evicted_key in evicted:
+                    if os.path.exists(self.file_path(evicted_key)):
+                        os.remove(self.file_path(evicted_key))
+
+            self.connection.commit()
+
+        return path
+
+    def stats(self) -> dict:
+        """
+        Method to return the cache size and hit/miss counters
+        """
+
+        with self.lock:
+            entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio").fetchone()
+            total = self.hits + self.misses
+
+            return {
+                "size": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# Create the audio cache instance
+audio_cache = AudioCache(settings.audio_cache_path, settings.audio_cache_max_bytes)
@@ -0,0 +1,210 @@
+# Import necessary libraries
+import io
+import sys
+import math
+import time
+import wave
+import numpy as np
+from scipy.signal import resample_poly
+from config import settings
+
+# Length of the frames the voice activity detection works on
+FRAME_SECONDS = 0.03
+
+# Audio kept around the detected speech so words are not clipped
+PADDING_SECONDS = 0.2
+
+# Shortest pause treated as a safe place to split long inputs
+MIN_SILENCE_SECONDS = 0.3
+
+# Share of voiced frames above which the clip has no quiet stretch to trim
+MAX_VOICED_RATIO = 0.95
+
+
+def decode_wav(audio_bytes: bytes) -> tuple[np.ndarray, int] | None:
+    """
+    Function to decode a PCM WAV file to mono float32 samples, returning None for other formats
+    """
+
+    try:
+        with wave.open(io.BytesIO(audio_bytes), 'rb') as wav_file:
+            channels = wav_file.getnchannels()
+            sample_width = wav_file.getsampwidth()
+            frame_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    # Convert the integer PCM samples to floats in [-1, 1]
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples).astype(np.float32) / (1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        return None
+
+    # Downmix to mono
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, frame_rate
+
+
+def resample(samples: np.ndarray, frame_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Function to resample audio with a polyphase filter
+    """
+
+    if frame_rate == target_rate:
+        return samples
+
+    divisor = math.gcd(frame_rate, target_rate)
+    return resample_poly(samples, target_rate // divisor, frame_rate // divisor).astype(np.float32)
+
+
+def detect_voice(samples: np.ndarray, frame_rate: int) -> np.ndarray:
+    """
+    Function to flag the frames whose energy is above an adaptive noise threshold
+    """
+
+    frame_length = int(frame_rate * FRAME_SECONDS)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
+
+    # Speech stands well above the quietest frames and is not negligible next to the loudest ones,
+    # the threshold stays below the peak for clips without a quiet stretch
+    threshold = max(np.percentile(energy, 10) * 3, energy.max() * 0.05)
+    threshold = max(min(threshold, energy.max() * 0.5), 1e-4)
+    return energy > threshold
+
+
+def find_segments(voiced: np.ndarray, max_frames: int) -> list[tuple[int, int]]:
+    """
+    Function to return (start, end) frame ranges around the speech, split at pauses to stay under a maximum length
+    """
+
+    voiced_frames = np.flatnonzero(voiced)
+    if len(voiced_frames) == 0:
+        return []
+
+    padding = int(PADDING_SECONDS / FRAME_SECONDS)
+    start = max(voiced_frames[0] - padding, 0)
+    end = min(voiced_frames[-1] + padding + 1, len(voiced))
+
+    min_silence = int(MIN_SILENCE_SECONDS / FRAME_SECONDS)
+    segments = []
+    while end - start > max_frames:
+        # Split in the middle of the last long enough pause before the maximum length
+        window = voiced[start:start + max_frames]
+        split = None
+        run = 0
+        for offset in range(len(window) - 1, 0, -1):
+            run = 0 if window[offset] else run + 1
+            if run >= min_silence:
+                split = start + offset + run // 2
+                break
+
+        split = split if split is not None else start + max_frames
+        segments.append((start, split))
+        start = split
+
+    segments.append((start, end))
+    return segments
+
+
+def encode_wav(samples: np.ndarray, frame_rate: int) -> bytes:
+    """
+    Function to encode mono float samples as a 16-bit PCM WAV file
+    """
+
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(frame_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+    return buffer.getvalue()
+
+
+def preprocess_audio(audio_bytes: bytes, target_rate=None, max_segment_seconds=None) -> list[bytes] | None:
+    """
+    Function to turn an uploaded WAV into compact 16 kHz mono segments of speech, or None if it cannot be decoded
+    """
+
+    target_rate = target_rate or settings.stt_sample_rate
+    max_segment_seconds = max_segment_seconds or settings.stt_max_segment_seconds
+
+    decoded = decode_wav(audio_bytes)
+    if decoded is None:
+        return None
+
+    samples = resample(*decoded, target_rate)
+    voiced = detect_voice(samples, target_rate)
+
+    # When nothing or almost everything is flagged the detection cannot be trusted, so the clip is kept untrimmed
+    if not voiced.any() or voiced.mean() > MAX_VOICED_RATIO:
+        voiced = np.ones(len(voiced), dtype=bool)
+
+    frame_length = int(target_rate * FRAME_SECONDS)
+    segments = find_segments(voiced, int(max_segment_seconds / FRAME_SECONDS))
+    if not segments:
+        return [encode_wav(samples, target_rate)]
+
+    # The last segment of an untrimmed clip also keeps the samples after the last full frame
+    return [
+        encode_wav(samples[start * frame_length:end * frame_length if end < len(voiced) else len(samples)], target_rate)
+        for start, end in segments
+    ]
+
+
+def run_benchmark(file_path: str):
+    """
+    Function to compare bytes sent and end-to-end transcription latency with and without preprocessing
+    """
+
+    from app.services.speech import transcribe, speech_to_text
+
+    with open(file_path, 'rb') as buffer:
+        audio_bytes = buffer.read()
+
+    start = time.perf_counter()
+    segments = preprocess_audio(audio_bytes)
+    preprocessing_time = time.perf_counter() - start
+
+    if segments is None:
+        print(f"{file_path} is not a PCM WAV file")
+        return
+
+    print(f"Raw upload:          {len(audio_bytes)} bytes")
+    print(f"Preprocessed upload: {sum(len(segment) for segment in segments)} bytes in {len(segments)} segments "
+          f"({preprocessing_time * 1000:.1f} ms of preprocessing)")
+
+    try:
+        start = time.perf_counter()
+        raw_text = transcribe(audio_bytes)
+        raw_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = speech_to_text(audio_bytes)
+        preprocessed_time = time.perf_counter() - start
+
+        print(f"Raw transcription:          {raw_time:.2f}s, {len(raw_text)} chars")
+        print(f"Preprocessed transcription: {preprocessed_time:.2f}s, {len(text)} chars")
+
+    except Exception as e:
+        print(f"Transcription skipped: {e}")
+
+
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1])
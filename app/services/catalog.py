@@ -0,0 +1,252 @@
+# Import necessary libraries
+import os
+import sys
+import json
+import sqlite3
+import threading
+from config import settings
+
+# Columns the document listing can be sorted by
+SORT_COLUMNS = {
+    "date": "date",
+    "size": "size",
+    "name": "name",
+    "file_name": "file_name"
+}
+
+
+class Catalog:
+    """
+    A metadata catalog of the documents in the knowledge base stored in SQLite with indexes
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the catalog database
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "file_name TEXT PRIMARY KEY, "
+            "name TEXT NOT NULL, "
+            "extension TEXT NOT NULL, "
+            "source TEXT NOT NULL, "
+            "date TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "url_count INTEGER NOT NULL DEFAULT 0, "
+            "content_hash TEXT, "
+            f"namespace TEXT NOT NULL DEFAULT '{settings.default_namespace}')"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS document_urls ("
+            "file_name TEXT NOT NULL, "
+            "position INTEGER NOT NULL, "
+            "url TEXT NOT NULL, "
+            "PRIMARY KEY (file_name, position)) WITHOUT ROWID"
+        )
+
+        # Add the content hash column to databases created before it existed
+        columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(documents)")]
+        if "content_hash" not in columns:
+            self.connection.execute("ALTER TABLE documents ADD COLUMN content_hash TEXT")
+
+        # Documents indexed before namespaces existed belong to the default namespace
+        if "namespace" not in columns:
+            self.connection.execute(
+                f"ALTER TABLE documents ADD COLUMN namespace TEXT NOT NULL DEFAULT '{settings.default_namespace}'"
+            )
+
+        for column in ("name", "extension", "source", "date", "size", "content_hash", "namespace"):
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{column} ON documents ({column})")
+        self.connection.commit()
+
+    def upsert(self, metadata: dict, source: str):
+        """
+        Method to add or replace a document from its metadata, with the crawled URLs of a website if any
+        """
+
+        file_name = f"{metadata['file_name']}{metadata['file_extension']}"
+        crawled_urls = metadata.get("crawled_urls", [])
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(file_name, name, extension, source, date, size, url_count, content_hash, namespace) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    file_name, metadata["file_name"], metadata["file_extension"], source,
+                    metadata["date"], metadata["size"], len(crawled_urls), metadata.get("content_hash"),
+                    metadata.get("namespace") or settings.default_namespace
+                )
+            )
+            self.connection.execute("DELETE FROM document_urls WHERE file_name = ?", (file_name,))
+            self.connection.executemany(
+                "INSERT INTO document_urls (file_name, position, url) VALUES (?, ?, ?)",
+                [(file_name, position, url) for position, url in enumerate(crawled_urls)]
+            )
+            self.connection.commit()
+
+    def delete(self, file_name: str):
+        """
+        Method to delete a document from the catalog
+        """
+
+        with self.lock:
+            self.connection.execute("DELETE FROM document_urls WHERE file_name = ?", (file_name,))
+            self.connection.execute("DELETE FROM documents WHERE file_name = ?", (file_name,))
+            self.connection.commit()
+
+    def delete_namespace(self, namespace: str) -> list[str]:
+        """
+        Method to delete the documents of a namespace from the catalog, returning their file names
+        """
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT file_name FROM documents WHERE namespace = ?", (namespace,)
+            ).fetchall()
+            file_names = [row["file_name"] for row in rows]
+
+            for i in range(0, len(file_names), 500):
+                name_slice = file_names[i:i + 500]
+                placeholders = ",".join("?" * len(name_slice))
+                self.connection.execute(f"DELETE FROM document_urls WHERE file_name IN ({placeholders})", name_slice)
+            self.connection.execute("DELETE FROM documents WHERE namespace = ?", (namespace,))
+            self.connection.commit()
+
+        return file_names
+
+    def count(self) -> int:
+        """
+        Method to return the number of documents in the catalog
+        """
+
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get_urls(self, file_name: str) -> list[str]:
+        """
+        Method to get the crawled URLs of a website document, must be called with the lock held
+        """
+
+        rows = self.connection.execute(
+            "SELECT url FROM document_urls WHERE file_name = ? ORDER BY position",
+            (file_name,)
+        ).fetchall()
+
+        return [row["url"] for row in rows]
+
+    def to_dict(self, row, full: bool) -> dict:
+        """
+        Method to convert a document row to the API representation, must be called with the lock held
+        """
+
+        document = {
+            "file_name": row["name"],
+            "file_extension": row["extension"],
+            "source": row["source"],
+            "date": row["date"],
+            "size": row["size"],
+            "url_count": row["url_count"],
+            "content_hash": row["content_hash"],
+            "namespace": row["namespace"]
+        }
+
+        if full and row["source"] == "crawl":
+            document["crawled_urls"] = self.get_urls(row["file_name"])
+
+        return document
+
+    def get(self, file_name: str, full=False) -> dict | None:
+        """
+        Method to get a document by its file name including the extension
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM documents WHERE file_name = ?", (file_name,)).fetchone()
+            return self.to_dict(row, full) if row else None
+
+    def list_documents(self, page=1, page_size=50, sort="date", order="desc", extension=None, source=None,
+                       search=None, full=False, namespace=None) -> dict:
+        """
+        Method to list a page of documents with sorting and filtering
+        """
+
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort field: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unsupported sort order: {order}")
+
+        # Build the filters
+        conditions, parameters = [], []
+        if extension:
+            conditions.append("extension = ?")
+            parameters.append(extension)
+        if source:
+            conditions.append("source = ?")
+            parameters.append(source)
+        if search:
+            conditions.append("name LIKE ?")
+            parameters.append(f"%{search}%")
+        if namespace:
+            conditions.append("namespace = ?")
+            parameters.append(namespace)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.lock:
+            total = self.connection.execute(f"SELECT COUNT(*) FROM documents {where}", parameters).fetchone()[0]
+            rows = self.connection.execute(
+                f"SELECT * FROM documents {where} ORDER BY {SORT_COLUMNS[sort]} {order.upper()}, file_name "
+                f"LIMIT ? OFFSET ?",
+                [*parameters, page_size, (page - 1) * page_size]
+            ).fetchall()
+            documents = [self.to_dict(row, full) for row in rows]
+
+        return {
+            "documents": documents,
+            "total": total,
+            "page": page,
+            "page_size": page_size
+        }
+
+    def import_sidecars(self, data_dir: str) -> int:
+        """
+        Method to import the metadata of the existing JSON sidecar files into the catalog
+        """
+
+        if not os.path.isdir(data_dir):
+            return 0
+
+        imported = 0
+        for file_name in os.listdir(data_dir):
+            if not file_name.endswith('.json'):
+                continue
+
+            try:
+                with open(os.path.join(data_dir, file_name), 'r') as buffer:
+                    metadata = json.load(buffer)
+
+                self.upsert(metadata, "crawl" if "crawled_urls" in metadata else "upload")
+                imported += 1
+
+            except Exception as e:
+                print(f"Skipping the metadata file {file_name}: {e}")
+
+        print(f"Imported {imported} documents into the catalog")
+        return imported
+
+
+# Create the catalog instance
+catalog = Catalog(settings.catalog_db_path)
+
+
+if __name__ == "__main__":
+    catalog.import_sidecars(sys.argv[1] if len(sys.argv) > 1 else settings.data_directory_path)
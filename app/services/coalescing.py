@@ -0,0 +1,129 @@
+# Import necessary libraries
+import asyncio
+from typing import AsyncIterator, Callable
+
+
+class SharedStream:
+    """
+    A stream produced once by a background task and replayed to every subscriber from its own cursor
+    """
+
+    def __init__(self, source: AsyncIterator[str]):
+        """
+        Initialize the buffer of produced chunks and start consuming the source
+        """
+
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.updated = asyncio.Event()
+        self.task = asyncio.create_task(self.pump(source))
+
+    def publish(self):
+        """
+        Method to wake up the subscribers waiting for new chunks
+        """
+
+        event = self.updated
+        self.updated = asyncio.Event()
+        event.set()
+
+    async def pump(self, source: AsyncIterator[str]):
+        """
+        Method to consume the source into the buffer
+        """
+
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self.publish()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.publish()
+
+    async def read(self) -> AsyncIterator[str]:
+        """
+        Method to yield the buffered and upcoming chunks from the start of the stream
+        """
+
+        cursor = 0
+        while True:
+            if cursor < len(self.chunks):
+                cursor += 1
+                yield self.chunks[cursor - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self.updated.wait()
+
+
+class StreamCoalescer:
+    """
+    A single-flight layer that shares one upstream stream between concurrent identical requests
+    """
+
+    def __init__(self):
+        """
+        Initialize the in-flight streams and the counters
+        """
+
+        self.in_flight = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def release(self, key, stream: SharedStream):
+        """
+        Method to forget a stream once it is finished or abandoned, so later requests start a fresh one
+        """
+
+        if self.in_flight.get(key) is stream:
+            del self.in_flight[key]
+
+    async def subscribe(self, key, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Method to stream the result for a key, joining the in-flight stream or starting one with the factory
+        """
+
+        stream = self.in_flight.get(key)
+        if stream is None:
+            stream = SharedStream(factory())
+            self.in_flight[key] = stream
+            stream.task.add_done_callback(lambda _: self.release(key, stream))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        stream.subscribers += 1
+        try:
+            async for chunk in stream.read():
+                yield chunk
+
+        finally:
+            # Stop the upstream work when every subscriber went away
+            stream.subscribers -= 1
+            if stream.subscribers == 0 and not stream.done:
+                stream.task.cancel()
+                self.release(key, stream)
+
+    def stats(self) -> dict:
+        """
+        Method to return the number of in-flight streams and of started and joined requests
+        """
+
+        total = self.leaders + self.followers
+
+        return {
+            "in_flight": len(self.in_flight),
+            "started": self.leaders,
+            "joined": self.followers,
+            "join_rate": self.followers / total if total else 0.0
+        }
+
+
+# Create the query coalescer instance
+query_coalescer = StreamCoalescer()
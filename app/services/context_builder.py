@@ -0,0 +1,121 @@
+# Import necessary libraries
+from config import settings
+
+# Shortest suffix/prefix match treated as splitter overlap rather than a coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Function to estimate the number of prompt tokens of a text at about four characters per token
+    """
+
+    return (len(text) + 3) // 4
+
+
+def merge_overlap(left: str, right: str, max_overlap=1000) -> str:
+    """
+    Function to join two adjacent chunks, dropping the text the splitter repeated at the start of the second one
+    """
+
+    for size in range(min(len(left), len(right), max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+
+    return f"{left}\n{right}"
+
+
+def source_label(passage: dict) -> str:
+    """
+    Function to build the source label of a merged passage
+    """
+
+    metadata = passage["metadata"]
+    label = metadata["file_name"]
+
+    if metadata.get("source_url"):
+        label += f", {metadata['source_url']}"
+    elif passage["pages"]:
+        first, last = min(passage["pages"]), max(passage["pages"])
+        label += f", page {first + 1}" if first == last else f", pages {first + 1}-{last + 1}"
+
+    return f"[Source: {label}]"
+
+
+def build_passages(chunks: list[dict]) -> list[dict]:
+    """
+    Function to group retrieved chunks by source, merge runs of adjacent chunks and order them by best rank
+    """
+
+    # Group the chunks by document and crawled page, remembering the best rank of each group
+    groups = {}
+    for rank, chunk in enumerate(chunks):
+        metadata = chunk["metadata"]
+        key = (metadata["file_name"], metadata.get("source_url"))
+        group = groups.setdefault(key, {"rank": rank, "chunks": []})
+        group["chunks"].append(chunk)
+
+    passages = []
+    for group in groups.values():
+        ordered = sorted(group["chunks"], key=lambda chunk: chunk["metadata"].get("chunk_index", 0))
+
+        # Merge every run of consecutive chunk indexes into one passage
+        current = None
+        for chunk in ordered:
+            index = chunk["metadata"].get("chunk_index")
+            page = chunk["metadata"].get("page")
+
+            if current is not None and index is not None and current["last_index"] is not None \
+                    and index == current["last_index"] + 1:
+                current["text"] = merge_overlap(current["text"], chunk["document"])
+                current["last_index"] = index
+            else:
+                current = {
+                    "rank": group["rank"],
+                    "metadata": chunk["metadata"],
+                    "text": chunk["document"],
+                    "last_index": index,
+                    "pages": []
+                }
+                passages.append(current)
+
+            if page is not None:
+                current["pages"].append(page)
+
+    return sorted(passages, key=lambda passage: passage["rank"])
+
+
+def build_context(chunks: list[dict], token_budget=None) -> str:
+    """
+    Function to pack retrieved chunks into a labeled prompt context under a token budget
+    """
+
+    token_budget = token_budget or settings.context_token_budget
+
+    sections = []
+    used_tokens = 0
+    for passage in build_passages(chunks):
+        section = f"{source_label(passage)}\n{passage['text']}"
+        section_tokens = estimate_tokens(section) + 1
+
+        # Cut the first passage down if it alone is over budget, skip later ones that do not fit
+        if used_tokens + section_tokens > token_budget:
+            if sections:
+                continue
+            section = section[:token_budget * 4]
+            section_tokens = token_budget
+
+        sections.append(section)
+        used_tokens += section_tokens
+
+    context = "\n\n".join(sections)
+
+    # Compare with the list representation previously sent to the model
+    naive_tokens = estimate_tokens(str([chunk["document"] for chunk in chunks]))
+    context_tokens = estimate_tokens(context)
+    print(
+        f"Context tokens: {context_tokens} for {len(chunks)} chunks in {len(sections)} passages "
+        f"(naive {naive_tokens}, saved {naive_tokens - context_tokens})"
+    )
+
+    return context
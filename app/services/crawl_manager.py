@@ -0,0 +1,421 @@
+# Import necessary libraries
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+import multiprocessing
+from datetime import datetime
+from urllib.parse import urlparse
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.services.indexer import sync_pages, remove_missing_pages, delete_document
+from app.services.crawler import run_scrapy_crawler
+from app.services.crawl_state import crawl_state
+from app.services.catalog import catalog
+from config import settings
+
+
+class CrawlIndexer:
+    """
+    An indexer that chunks and embeds crawled pages in micro-batches as they arrive
+    """
+
+    def __init__(self, domain_name: str, batch_pages=None, chunk_size=2500, chunk_overlap=300, namespace=None):
+        """
+        Initialize the indexer for a crawled website in a namespace
+        """
+
+        self.domain_name = domain_name
+        self.file_name = f"{domain_name}.txt"
+        self.namespace = namespace or settings.default_namespace
+        self.batch_pages = batch_pages or settings.crawl_batch_pages
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+        self.crawled_urls = []
+        self.pending_pages = []
+        self.pages_unchanged = 0
+        self.result = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+        # A website crawled into another namespace is moved, so its unchanged pages must be indexed again
+        existing = catalog.get(self.file_name)
+        if existing is not None and existing["namespace"] != self.namespace:
+            delete_document(self.file_name, existing["namespace"])
+
+        # Pages are only skipped as unchanged when the website is still indexed in the namespace
+        self.reindex = existing is None or existing["namespace"] != self.namespace
+
+        # Data directory to save the data
+        data_dir = settings.data_directory_path
+        os.makedirs(data_dir, exist_ok=True)
+
+        # Stream the page texts to the file in the data directory
+        self.file_path = os.path.join(data_dir, self.file_name)
+        self.buffer = open(self.file_path, 'w', encoding='utf-8')
+
+    def add_page(self, page: dict):
+        """
+        Method to add a crawled page and index the pending pages once a micro-batch is full
+        """
+
+        if self.crawled_urls:
+            self.buffer.write("\n\n")
+        self.buffer.write(page["text"])
+
+        self.crawled_urls.append(page["url"])
+
+        # Pages that did not change since the previous crawl keep their chunks
+        if page.get("unchanged") and not self.reindex:
+            self.pages_unchanged += 1
+            crawl_state.put_many([page], self.file_name, self.namespace)
+            return
+
+        self.pending_pages.append(page)
+
+        if len(self.pending_pages) >= self.batch_pages:
+            self.flush()
+
+    def flush(self):
+        """
+        Method to chunk, embed and store the pending pages
+        """
+
+        if not self.pending_pages:
+            return
+
+        pending_pages = self.pending_pages
+        self.pending_pages = []
+
+        pages = [(page["url"], self.text_splitter.split_text(page["text"])) for page in pending_pages]
+        result = sync_pages(pages, self.file_name, self.namespace)
+        for key, value in result.items():
+            self.result[key] += value
+
+        # Remember the validators and hashes of the indexed pages for the next recrawl
+        crawl_state.put_many(pending_pages, self.file_name, self.namespace)
+
+        print(f"Indexed {len(self.crawled_urls)} pages of {self.domain_name} so far: {self.result}")
+
+    def close(self, prune=True):
+        """
+        Method to index the remaining pages, drop the pages that are gone and save the metadata
+        """
+
+        self.flush()
+        self.buffer.close()
+
+        # Remove the chunks of the pages that were not found in a complete crawl
+        if prune:
+            self.result["removed"] += remove_missing_pages(self.file_name, set(self.crawled_urls), self.namespace)
+
+        # Get the file size
+        try:
+            file_size = os.path.getsize(self.file_path)
+        except Exception as e:
+            file_size = 0
+
+        # Save the file metadata to a JSON file
+        json_path = self.file_path + ".json"
+        metadata = {
+            "file_name": self.domain_name,
+            "file_extension": ".txt",
+            "date": datetime.now().isoformat(),
+            "size": file_size,
+            "namespace": self.namespace,
+            "crawled_urls": self.crawled_urls
+        }
+        with open(json_path, 'w') as buffer:
+            json.dump(metadata, buffer, indent=4)
+
+        # Add the website to the catalog
+        catalog.upsert(metadata, "crawl")
+
+        print(f"Crawl of {self.domain_name} indexed: {self.result}, unchanged pages: {self.pages_unchanged}")
+        return {**self.result, "pages_unchanged": self.pages_unchanged}
+
+
+class CrawlManager:
+    """
+    A manager that runs each crawl in a separate worker process and indexes its pages in the API process
+    """
+
+    def __init__(self, path: str, max_concurrent: int):
+        """
+        Initialize the crawl database, the pending queue and the concurrency limit
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.queue = queue.Queue()
+        self.slots = threading.Semaphore(max_concurrent)
+        self.processes = {}
+        self.dispatcher = None
+        self.stopping = False
+        self.lock = threading.Lock()
+
+        # Spawn fresh interpreters so the Twisted reactor never shares state with the API process
+        self.context = multiprocessing.get_context("spawn")
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS crawls ("
+            "id TEXT PRIMARY KEY, "
+            "url TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "max_pages INTEGER NOT NULL, "
+            "max_seconds INTEGER NOT NULL, "
+            "recrawl INTEGER NOT NULL DEFAULT 0, "
+            "pages_crawled INTEGER NOT NULL DEFAULT 0, "
+            "finish_reason TEXT, "
+            "result TEXT, "
+            "error TEXT, "
+            "created_at TEXT NOT NULL, "
+            "updated_at TEXT NOT NULL, "
+            f"namespace TEXT NOT NULL DEFAULT '{settings.default_namespace}')"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_crawls_created_at ON crawls (created_at)")
+
+        # Add the recrawl column to databases created before it existed
+        columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(crawls)")]
+        if "recrawl" not in columns:
+            self.connection.execute("ALTER TABLE crawls ADD COLUMN recrawl INTEGER NOT NULL DEFAULT 0")
+
+        # Crawls created before namespaces existed index into the default namespace
+        if "namespace" not in columns:
+            self.connection.execute(
+                f"ALTER TABLE crawls ADD COLUMN namespace TEXT NOT NULL DEFAULT '{settings.default_namespace}'"
+            )
+
+        self.connection.commit()
+
+    def update(self, crawl_id: str, **fields):
+        """
+        Method to update the stored fields of a crawl
+        """
+
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+
+        with self.lock:
+            self.connection.execute(f"UPDATE crawls SET {assignments} WHERE id = ?", [*fields.values(), crawl_id])
+            self.connection.commit()
+
+    def submit(self, url: str, max_pages=None, max_seconds=None, recrawl=False, namespace=None) -> dict:
+        """
+        Method to create a crawl into a namespace and put it on the queue
+        """
+
+        crawl_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO crawls (id, url, status, max_pages, max_seconds, recrawl, namespace, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (
+                    crawl_id, url,
+                    max_pages or settings.crawl_max_pages,
+                    max_seconds or settings.crawl_max_seconds,
+                    int(recrawl),
+                    namespace or settings.default_namespace,
+                    now, now
+                )
+            )
+            self.connection.commit()
+
+        self.queue.put(crawl_id)
+        return self.get(crawl_id)
+
+    def get(self, crawl_id: str) -> dict | None:
+        """
+        Method to get the status, progress and result of a crawl
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM crawls WHERE id = ?", (crawl_id,)).fetchone()
+
+        return self.to_dict(row) if row else None
+
+    def list_crawls(self, limit=50) -> list[dict]:
+        """
+        Method to list the most recent crawls
+        """
+
+        with self.lock:
+            rows = self.connection.execute("SELECT * FROM crawls ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+
+        return [self.to_dict(row) for row in rows]
+
+    @staticmethod
+    def to_dict(row) -> dict:
+        """
+        Method to convert a crawl row to the API representation
+        """
+
+        return {
+            "crawl_id": row["id"],
+            "url": row["url"],
+            "status": row["status"],
+            "recrawl": bool(row["recrawl"]),
+            "namespace": row["namespace"],
+            "budget": {
+                "max_pages": row["max_pages"],
+                "max_seconds": row["max_seconds"]
+            },
+            "progress": {
+                "pages_crawled": row["pages_crawled"]
+            },
+            "finish_reason": row["finish_reason"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def run_crawl(self, crawl_id: str):
+        """
+        Method to run a crawl in a worker process and index the pages it sends back
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM crawls WHERE id = ?", (crawl_id,)).fetchone()
+
+        # A bounded queue applies backpressure to the crawler when indexing falls behind
+        item_queue = self.context.Queue(maxsize=settings.crawl_batch_pages * 4)
+        process = self.context.Process(
+            target=run_scrapy_crawler,
+            args=(row["url"], item_queue, row["max_pages"], row["max_seconds"], bool(row["recrawl"])),
+            daemon=True
+        )
+
+        self.update(crawl_id, status="running", pages_crawled=0, error=None)
+        print(f"Running crawl {crawl_id} for {row['url']}")
+
+        indexer = None
+        finish_reason = None
+        deadline = time.monotonic() + row["max_seconds"] + 60
+
+        try:
+            process.start()
+            self.processes[crawl_id] = process
+
+            while True:
+                try:
+                    message = item_queue.get(timeout=1)
+                except queue.Empty:
+                    # Stop waiting if the worker died or overran its time budget
+                    if not process.is_alive():
+                        raise RuntimeError(f"Crawler process exited with code {process.exitcode}")
+                    if time.monotonic() > deadline:
+                        finish_reason = "time_budget_exceeded"
+                        break
+                    continue
+
+                if message["type"] == "page":
+                    # Name the document after the domain of the first crawled page
+                    if indexer is None:
+                        indexer = CrawlIndexer(
+                            urlparse(message["url"]).netloc.replace('.', '_'), namespace=row["namespace"]
+                        )
+
+                    indexer.add_page(message)
+                    self.update(crawl_id, pages_crawled=len(indexer.crawled_urls))
+
+                elif message["type"] == "done":
+                    finish_reason = message["finish_reason"]
+                    break
+
+                elif message["type"] == "error":
+                    raise RuntimeError(message["error"])
+
+            # Only a crawl that finished on its own has seen every page of the site
+            result = indexer.close(prune=finish_reason == "finished") if indexer else None
+            self.update(crawl_id, status="completed", finish_reason=finish_reason, result=json.dumps(result))
+
+        except Exception as e:
+            if indexer is not None:
+                indexer.close(prune=False)
+
+            # Crawls stopped by a shutdown stay running so that they are resumed on the next start
+            if self.stopping:
+                print(f"Crawl {crawl_id} interrupted by shutdown")
+            else:
+                print(f"Crawl {crawl_id} failed: {e}")
+                self.update(crawl_id, status="failed", error=str(e))
+
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=10)
+            self.processes.pop(crawl_id, None)
+
+    def run_and_release(self, crawl_id: str):
+        """
+        Method to run a crawl and free its concurrency slot afterwards
+        """
+
+        try:
+            self.run_crawl(crawl_id)
+        finally:
+            self.slots.release()
+
+    def dispatch(self):
+        """
+        Method run by the dispatcher thread to start queued crawls when a slot is free
+        """
+
+        while True:
+            crawl_id = self.queue.get()
+            if crawl_id is None:
+                break
+
+            self.slots.acquire()
+            threading.Thread(target=self.run_and_release, args=(crawl_id,), daemon=True).start()
+
+    def start(self):
+        """
+        Method to resume the unfinished crawls and start the dispatcher thread
+        """
+
+        # Re-queue the crawls that were queued or running when the server stopped
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id FROM crawls WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+
+        for row in rows:
+            print(f"Resuming crawl {row['id']}")
+            self.update(row["id"], status="queued")
+            self.queue.put(row["id"])
+
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def stop(self):
+        """
+        Method to stop the dispatcher and terminate the running crawler processes
+        """
+
+        self.stopping = True
+        self.queue.put(None)
+
+        for process in list(self.processes.values()):
+            process.terminate()
+
+
+# Create the crawl manager instance
+crawl_manager = CrawlManager(settings.jobs_db_path, settings.crawl_max_concurrent)
+
+
+if __name__ == "__main__":
+    crawl_manager.start()
+    crawl = crawl_manager.submit("https://lnmiit.ac.in/")
+
+    # Wait for the crawl to finish
+    while crawl_manager.get(crawl["crawl_id"])["status"] in ("queued", "running"):
+        time.sleep(5)
+
+    print(crawl_manager.get(crawl["crawl_id"]))
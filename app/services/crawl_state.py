@@ -0,0 +1,121 @@
+# Import necessary libraries
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+import threading
+from config import settings
+
+
+def hash_page(text: str) -> str:
+    """
+    Function to compute the content hash of the extracted text of a page
+    """
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    """
+    A per-URL store of HTTP validators, content hashes and extracted text from previous crawls
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the crawl state database
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, "
+            "etag TEXT, "
+            "last_modified TEXT, "
+            "content_hash TEXT NOT NULL, "
+            "text BLOB NOT NULL, "
+            "links TEXT NOT NULL, "
+            "file_name TEXT, "
+            "namespace TEXT)"
+        )
+
+        # Add the document columns to databases created before they existed
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(pages)")]
+        for column in ("file_name", "namespace"):
+            if column not in columns:
+                self.connection.execute(f"ALTER TABLE pages ADD COLUMN {column} TEXT")
+
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_pages_file_name ON pages (file_name)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_pages_namespace ON pages (namespace)")
+        self.connection.commit()
+
+    def get(self, url: str) -> dict | None:
+        """
+        Method to get the state of a page from the previous crawl
+        """
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified, content_hash, text, links FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "content_hash": row[2],
+            "text": zlib.decompress(row[3]).decode("utf-8"),
+            "links": json.loads(row[4])
+        }
+
+    def put_many(self, pages: list[dict], file_name: str, namespace: str):
+        """
+        Method to save the state of crawled pages once they are indexed under a document of a namespace
+        """
+
+        rows = [
+            (
+                page["url"], page.get("etag"), page.get("last_modified"), page["content_hash"],
+                zlib.compress(page["text"].encode("utf-8")), json.dumps(page.get("links", [])),
+                file_name, namespace
+            )
+            for page in pages
+        ]
+
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, text, links, file_name, namespace) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.connection.commit()
+
+    def delete_file(self, file_name: str):
+        """
+        Method to forget the pages of a crawled document so that the next crawl indexes them again
+        """
+
+        with self.lock:
+            self.connection.execute("DELETE FROM pages WHERE file_name = ?", (file_name,))
+            self.connection.commit()
+
+    def delete_namespace(self, namespace: str):
+        """
+        Method to forget the pages of every crawled document of a namespace
+        """
+
+        with self.lock:
+            self.connection.execute("DELETE FROM pages WHERE namespace = ?", (namespace,))
+            self.connection.commit()
+
+
+# Create the crawl state instance
+crawl_state = CrawlState(settings.crawl_state_path)
@@ -1,76 +1,27 @@
 # Import necessary libraries
-import os
-import json
-from datetime import datetime
 from urllib.parse import urlparse
-from scrapy import Spider
+from scrapy import Spider, Request
 from scrapy.crawler import CrawlerProcess
 from scrapy.linkextractors import LinkExtractor
-from app.services.indexer import add_document
+from app.services.crawl_state import crawl_state, hash_page
+from app.services.html_extractor import extract_text
 from config import settings
 
 
 class DataPipelines:
     """
-    A Data Pipeline to process crawled items and save them to a file
+    A Data Pipeline to send crawled items to the crawl manager for indexing
     """
 
-    def open_spider(self, spider):
-        """
-        Method called when the spider is opened
-        """
-
-        self.crawled_urls = []
-        self.text_contents = []
-
     def process_item(self, item, spider):
         """
         Method to process each item scraped by the spider
         """
 
-        self.crawled_urls.append(item['url'])
-        self.text_contents.append(item['text'])
+        spider.item_queue.put({"type": "page", **item})
 
         return item
 
-    def close_spider(self, spider):
-        """
-        Method called when the spider is closed
-        """
-
-        domain_name = urlparse(self.crawled_urls[0]).netloc.replace('.', '_')
-        file_name = f"{domain_name}.txt"
-
-        # Data directory to save the data
-        data_dir = settings.data_directory_path
-        os.makedirs(data_dir, exist_ok=True)
-
-        # Save the file to the data directory
-        file_path = os.path.join(data_dir, file_name)
-        with open(file_path, 'w', encoding='utf-8') as buffer:
-            buffer.write("\n\n".join(self.text_contents))
-
-        # Get the file size
-        try:
-            file_size = os.path.getsize(file_path)
-        except Exception as e:
-            file_size = 0
-
-        # Save the file metadata to a JSON file
-        json_path = file_path + ".json"
-        metadata = {
-            "file_name": domain_name,
-            "file_extension": ".txt",
-            "date": datetime.now().isoformat(),
-            "size": file_size,
-            "crawled_urls": self.crawled_urls
-        }
-        with open(json_path, 'w') as buffer:
-            json.dump(metadata, buffer, indent=4)
-
-        # Add the documents to the vector store
-        add_document(file_path, domain_name, ".txt", 2500, 300)
-
 
 class WebTextSpider(Spider):
     """
@@ -91,6 +42,9 @@ class WebTextSpider(Spider):
         'HTTPCACHE_ENABLED': False
     }
 
+    # Let 304 Not Modified responses to conditional requests reach the parse method
+    handle_httpstatus_list = [304]
+
     # Link extractor to filter out unwanted urls
     link_extractor = LinkExtractor(
         deny_extensions=[
@@ -111,6 +65,36 @@ class WebTextSpider(Spider):
 
         self.allowed_domains = kwargs.get('allowed_domains', [])
         self.start_urls = kwargs.get('start_urls', [])
+        self.item_queue = kwargs.get('item_queue')
+        self.recrawl = kwargs.get('recrawl', False)
+
+    def conditional_headers(self, url):
+        """
+        Build the conditional request headers for a URL from the previous crawl in recrawl mode
+        """
+
+        if not self.recrawl:
+            return {}
+
+        state = crawl_state.get(url)
+        if state is None:
+            return {}
+
+        headers = {}
+        if state['etag']:
+            headers['If-None-Match'] = state['etag']
+        if state['last_modified']:
+            headers['If-Modified-Since'] = state['last_modified']
+
+        return headers
+
+    async def start(self):
+        """
+        Yield the initial requests, conditional in recrawl mode
+        """
+
+        for url in self.start_urls:
+            yield Request(url, callback=self.parse, headers=self.conditional_headers(url))
 
     def parse(self, response, **kwargs):
         """
@@ -124,52 +108,62 @@ class WebTextSpider(Spider):
             self.logger.info(f"Skipping the not allowed URL: {response.url}")
             return
 
+        # Reuse the previous crawl for pages that were not modified
+        if response.status == 304:
+            state = crawl_state.get(response.url)
+            if state is None:
+                self.logger.info(f"Skipping the not modified URL without state: {response.url}")
+                return
+
+            self.logger.info(f"Not modified URL: {response.url}")
+            yield {
+                'url': response.url,
+                'text': state['text'],
+                'unchanged': True,
+                'etag': state['etag'],
+                'last_modified': state['last_modified'],
+                'content_hash': state['content_hash'],
+                'links': state['links']
+            }
+
+            for url in state['links']:
+                yield response.follow(url, self.parse, headers=self.conditional_headers(url))
+            return
+
         # Check if the response is HTML content
-        if not response.headers.get('Content-Type', '').decode().lower().startswith('text/html'):
+        if not response.headers.get('Content-Type', b'').decode().lower().startswith('text/html'):
             self.logger.info(f"Skipping the non HTML response: {response.url}")
             return
 
-        # Extract text content from the response
-        excluded_ancestors = [
-            'not(ancestor::header)',
-            'not(ancestor::footer)',
-            'not(ancestor::input)',
-            'not(ancestor::textarea)',
-            'not(ancestor::button)',
-        ]
-        exclusion = ' and '.join(excluded_ancestors)
-
-        selectors = [
-            f'//h1[{exclusion}]/text()',
-            f'//h2[{exclusion}]/text()',
-            f'//h3[{exclusion}]/text()',
-            f'//h4[{exclusion}]/text()',
-            f'//h5[{exclusion}]/text()',
-            f'//h6[{exclusion}]/text()',
-            f'//p[{exclusion}]/text()',
-            f'//span[{exclusion}]/text()',
-            f'//div[{exclusion}]/text()',
-            f'//li[{exclusion}]/text()',
-            f'//article[{exclusion}]/text()',
-            f'//main[{exclusion}]/text()',
-        ]
-
-        text_contents = response.xpath(' | '.join(selectors)).getall()
-        text_content = ' '.join(text.strip().replace('\n', '') for text in text_contents if text.strip())
+        # Extract text content from the response in a single pass over the parsed tree
+        text_content = extract_text(response.selector.root, settings.crawl_drop_boilerplate)
+
+        # Use the link extractor to find links
+        links = [link.url for link in self.link_extractor.extract_links(response)]
+
+        # A page with the same text as in the previous crawl does not need to be indexed again
+        content_hash = hash_page(text_content)
+        previous = crawl_state.get(response.url) if self.recrawl else None
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
 
         yield {
             'url': response.url,
-            'text': text_content
+            'text': text_content,
+            'unchanged': previous is not None and previous['content_hash'] == content_hash,
+            'etag': etag.decode() if etag else None,
+            'last_modified': last_modified.decode() if last_modified else None,
+            'content_hash': content_hash,
+            'links': links
         }
 
-        # Use the link extractor to find links
-        links = self.link_extractor.extract_links(response)
-        for link in links:
-            yield response.follow(link, self.parse)
+        for url in links:
+            yield response.follow(url, self.parse, headers=self.conditional_headers(url))
 
-def run_scrapy_crawler(website_url):
+def run_scrapy_crawler(website_url, item_queue, max_pages=0, max_seconds=0, recrawl=False):
     """
-    Function to run the Scrapy crawler for a given website URL
+    Function to run the Scrapy crawler for a given website URL, meant to run in a separate worker process
     """
 
     parsed_url = urlparse(website_url)
@@ -179,11 +173,24 @@ def run_scrapy_crawler(website_url):
 
     print(f"Start crawling for URL: {parsed_url.netloc}")
 
-    process = CrawlerProcess()
-
-    process.crawl(WebTextSpider, allowed_domains=allowed_domains, start_urls=start_urls)
-    process.start()
-
-
-if __name__ == "__main__":
-    run_scrapy_crawler("https://lnmiit.ac.in/")
+    try:
+        # Stop the crawl once the page or time budget is used up
+        process = CrawlerProcess({
+            'CLOSESPIDER_PAGECOUNT': max_pages,
+            'CLOSESPIDER_TIMEOUT': max_seconds
+        })
+
+        crawler = process.create_crawler(WebTextSpider)
+        process.crawl(
+            crawler,
+            allowed_domains=allowed_domains,
+            start_urls=start_urls,
+            item_queue=item_queue,
+            recrawl=recrawl
+        )
+        process.start()
+
+        item_queue.put({"type": "done", "finish_reason": crawler.stats.get_value('finish_reason')})
+
+    except Exception as e:
+        item_queue.put({"type": "error", "error": str(e)})
@@ -1,17 +1,115 @@
 # Import necessary libraries
-from app.clients.gemini_client import gemini_client
-# from sentence_transformers import SentenceTransformer
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from app.services.embedding_backends import embedding_backend
+from app.services.embedding_cache import embedding_cache
+from config import settings
+
+
+def cache_model(backend) -> str:
+    """
+    Function to build the cache namespace of a backend, so vectors from different models never mix
+    """
+
+    return f"{backend.name}/{backend.model}/{backend.dimension or 'native'}"
+
+
+# Embeddings are cached per backend, model and dimension
+CACHE_MODEL = cache_model(embedding_backend)
+
+
+def backend_identity() -> dict:
+    """
+    Function to return the name, model and reduced output dimension, if any, of the configured embedding backend
+    """
+
+    return {
+        "embedding_backend": embedding_backend.name,
+        "embedding_model": embedding_backend.model,
+        "embedding_dimension": embedding_backend.dimension
+    }
 
-# Qwen embedding model (Local model)
-# model = SentenceTransformer("Qwen/Qwen3-Embedding-0.6B")
 
 def generate_embedding(content):
     """
-    Function to generate embeddings for a content using Gemini API
+    Function to generate embeddings for a content using the configured backend
+    """
+
+    # Check the embedding cache first
+    cached = embedding_cache.get_many(CACHE_MODEL, [content])[0]
+    if cached is not None:
+        return cached
+
+    embedding = embedding_backend.embed([content])[0]
+
+    embedding_cache.put_many(CACHE_MODEL, [content], [embedding])
+    return embedding
+
+
+async def generate_embedding_async(content):
+    """
+    Function to generate embeddings for a content without blocking the event loop
     """
 
-    # embeddings = model.encode(content)
-    # return embeddings
+    # Check the embedding cache first, off the event loop
+    cached = (await asyncio.to_thread(embedding_cache.get_many, CACHE_MODEL, [content]))[0]
+    if cached is not None:
+        return cached
+
+    embedding = await embedding_backend.embed_async(content)
+
+    await asyncio.to_thread(embedding_cache.put_many, CACHE_MODEL, [content], [embedding])
+    return embedding
+
+
+def generate_embeddings(contents: list[str], batch_size=None, max_workers=None, progress_callback=None,
+                        backend=None, cache=None):
+    """
+    Function to generate embeddings for a list of contents, returned in the same order as the input
+    """
+
+    backend = backend or embedding_backend
+    cache = cache or embedding_cache
+    model = cache_model(backend)
+    batch_size = batch_size or settings.embedding_batch_size
+    max_workers = max_workers or backend.max_workers or settings.embedding_max_workers
+
+    if not contents:
+        return []
+
+    # Check the embedding cache first and only embed the missing contents
+    embeddings = cache.get_many(model, contents)
+    missing_indexes = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    print(f"Embedding cache hits: {len(contents) - len(missing_indexes)}/{len(contents)}")
+
+    done = len(contents) - len(missing_indexes)
+    if progress_callback:
+        progress_callback(done, len(contents))
+
+    if not missing_indexes:
+        return embeddings
+
+    # Group the missing contents into provider-sized batches
+    missing_contents = [contents[i] for i in missing_indexes]
+    batches = [missing_contents[i:i + batch_size] for i in range(0, len(missing_contents), batch_size)]
+
+    # Run a bounded number of batches concurrently, map() keeps the input order
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        results = executor.map(backend.embed, batches)
+
+        new_embeddings = []
+        for index, batch_embeddings in enumerate(results):
+            print(f"Generated embeddings for batch {index + 1}/{len(batches)}")
+            new_embeddings.extend(batch_embeddings)
+
+            done += len(batch_embeddings)
+            if progress_callback:
+                progress_callback(done, len(contents))
+
+    # Store the new embeddings in the cache
+    cache.put_many(model, missing_contents, new_embeddings)
+
+    for index, embedding in zip(missing_indexes, new_embeddings):
+        embeddings[index] = embedding
 
-    result = gemini_client.models.embed_content(model="gemini-embedding-001", contents=content)
-    return result.embeddings[0].values
+    return embeddings
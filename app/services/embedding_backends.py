@@ -0,0 +1,196 @@
+# Import necessary libraries
+import re
+import math
+import asyncio
+import hashlib
+import threading
+from google.genai import types
+from app.clients.gemini_client import gemini_client
+from config import settings
+
+# Pattern used by the stub backend to split text into word tokens
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def truncate_embedding(embedding, dimension: int) -> list[float]:
+    """
+    Function to truncate a Matryoshka embedding to its leading dimensions and renormalize it to unit length
+    """
+
+    truncated = list(embedding[:dimension])
+    norm = math.sqrt(sum(value * value for value in truncated)) or 1.0
+    return [value / norm for value in truncated]
+
+
+class GeminiBackend:
+    """
+    A remote embedding backend using the Gemini API
+    """
+
+    name = "gemini"
+
+    # Remote batches are network bound and can run concurrently
+    max_workers = None
+
+    def __init__(self, model: str, dimension=None, client=None):
+        """
+        Initialize the backend with the Gemini embedding model name, an optional output dimensionality and client
+        """
+
+        self.model = model
+        self.dimension = dimension
+        self.client = client or gemini_client
+
+        # Ask the provider for reduced-dimension vectors instead of truncating them locally
+        self.config = types.EmbedContentConfig(output_dimensionality=dimension) if dimension else None
+
+    def normalize(self, values) -> list[float]:
+        """
+        Method to renormalize reduced-dimension vectors, which the provider only normalizes at full size
+        """
+
+        return truncate_embedding(values, self.dimension) if self.dimension else values
+
+    def embed(self, contents: list[str]) -> list[list[float]]:
+        """
+        Method to generate embeddings for a batch of contents
+        """
+
+        result = self.client.models.embed_content(model=self.model, contents=contents, config=self.config)
+        return [self.normalize(embedding.values) for embedding in result.embeddings]
+
+    async def embed_async(self, content: str) -> list[float]:
+        """
+        Method to generate the embedding of a content using the async Gemini client
+        """
+
+        result = await self.client.aio.models.embed_content(model=self.model, contents=content, config=self.config)
+        return self.normalize(result.embeddings[0].values)
+
+
+class LocalBackend:
+    """
+    A local CPU embedding backend using sentence-transformers, optionally quantized to int8
+    """
+
+    name = "local"
+
+    # The model already uses every core for a batch, so batches run one at a time
+    max_workers = 1
+
+    def __init__(self, model_name: str, quantize=False, dimension=None, batch_size=32):
+        """
+        Initialize the backend, the model itself is loaded on first use
+        """
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.model = f"{model_name}:int8" if quantize else model_name
+        self.encoder = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        Method to load the sentence-transformers model once, applying dynamic int8 quantization if enabled
+        """
+
+        with self.lock:
+            if self.encoder is None:
+                from sentence_transformers import SentenceTransformer
+
+                print(f"Loading the local embedding model {self.model_name}")
+                encoder = SentenceTransformer(self.model_name, device="cpu")
+
+                if self.quantize:
+                    import torch
+                    encoder = torch.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+
+                self.encoder = encoder
+
+        return self.encoder
+
+    def embed(self, contents: list[str]) -> list[list[float]]:
+        """
+        Method to generate normalized embeddings for a batch of contents
+        """
+
+        embeddings = self.load().encode(
+            contents, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True
+        ).tolist()
+
+        if self.dimension:
+            return [truncate_embedding(embedding, self.dimension) for embedding in embeddings]
+        return embeddings
+
+    async def embed_async(self, content: str) -> list[float]:
+        """
+        Method to generate the embedding of a content off the event loop
+        """
+
+        return (await asyncio.to_thread(self.embed, [content]))[0]
+
+
+class StubBackend:
+    """
+    A deterministic offline embedding backend hashing word tokens into a fixed number of dimensions
+    """
+
+    name = "stub"
+    max_workers = 1
+
+    def __init__(self, native_dimension: int, dimension=None):
+        """
+        Initialize the backend with the hashing dimension and an optional reduced output dimension
+        """
+
+        self.native_dimension = native_dimension
+        self.dimension = dimension
+        self.model = f"hashing-{native_dimension}"
+
+    def embed_one(self, content: str) -> list[float]:
+        """
+        Method to generate the normalized token hashing embedding of a content
+        """
+
+        vector = [0.0] * self.native_dimension
+        for token in TOKEN_PATTERN.findall(content.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.native_dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+        return truncate_embedding(vector, self.dimension or self.native_dimension)
+
+    def embed(self, contents: list[str]) -> list[list[float]]:
+        """
+        Method to generate embeddings for a batch of contents
+        """
+
+        return [self.embed_one(content) for content in contents]
+
+    async def embed_async(self, content: str) -> list[float]:
+        """
+        Method to generate the embedding of a content
+        """
+
+        return self.embed_one(content)
+
+
+def create_backend(name: str, dimension=None):
+    """
+    Function to create an embedding backend by name, with an optional reduced output dimension
+    """
+
+    if name == "gemini":
+        return GeminiBackend(settings.gemini_embedding_model, dimension)
+    if name == "local":
+        return LocalBackend(settings.local_embedding_model, settings.local_embedding_quantize, dimension)
+    if name == "stub":
+        return StubBackend(settings.stub_embedding_dimension, dimension)
+
+    raise ValueError(f"Unsupported embedding backend: {name}")
+
+
+# Create the embedding backend instance
+embedding_backend = create_backend(settings.embedding_backend, settings.embedding_dimension)
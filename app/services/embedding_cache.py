@@ -0,0 +1,129 @@
+# Import necessary libraries
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from config import settings
+
+
+class EmbeddingCache:
+    """
+    A persistent, content-addressed embedding cache stored in SQLite with LRU eviction
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        """
+        Initialize the cache database and the hit/miss counters
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, "
+            "embedding BLOB NOT NULL, "
+            "last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(model: str, content: str) -> str:
+        """
+        Method to build the cache key from the model name and a hash of the content
+        """
+
+        return hashlib.sha256(f"{model}\n{content}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, contents: list[str]) -> list:
+        """
+        Method to look up embeddings for a list of contents, returning None for every miss
+        """
+
+        keys = [self.make_key(model, content) for content in contents]
+        found = {}
+
+        with self.lock:
+            # Query in slices to stay under the SQLite variable limit
+            for i in range(0, len(keys), 500):
+                key_slice = keys[i:i + 500]
+                placeholders = ",".join("?" * len(key_slice))
+                rows = self.connection.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                    key_slice
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            # Mark the found entries as recently used
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            self.connection.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, model: str, contents: list[str], embeddings: list):
+        """
+        Method to store embeddings for a list of contents and evict the least recently used entries
+        """
+
+        now = time.time()
+        rows = [
+            (self.make_key(model, content), array("f", embedding).tobytes(), now)
+            for content, embedding in zip(contents, embeddings)
+        ]
+
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                rows
+            )
+
+            # Evict the least recently used entries above the size cap
+            count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+            self.connection.commit()
+
+    def stats(self) -> dict:
+        """
+        Method to return the cache size and hit/miss counters
+        """
+
+        with self.lock:
+            size = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            total = self.hits + self.misses
+
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# Create the embedding cache instance
+embedding_cache = EmbeddingCache(settings.embedding_cache_path, settings.embedding_cache_max_entries)
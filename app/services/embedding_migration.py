@@ -0,0 +1,177 @@
+# Import necessary libraries
+import time
+import argparse
+import numpy as np
+import chromadb
+from app.clients.chromadb_client import chromadb_client, collection
+from app.services.embedding_backends import create_backend
+from app.services.indexer import collection_backend
+from config import settings
+
+# Dimensions compared by the recall and latency report
+REPORT_DIMENSIONS = (3072, 1536, 768, 256)
+
+
+def truncate_matrix(embeddings: np.ndarray, dimension: int) -> np.ndarray:
+    """
+    Function to truncate a matrix of Matryoshka embeddings to its leading dimensions and renormalize the rows
+    """
+
+    truncated = embeddings[:, :dimension]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.where(norms == 0, 1, norms)
+
+
+def load_embeddings(page_size=1000):
+    """
+    Function to load the ids and embeddings of the whole collection
+    """
+
+    ids, embeddings = [], []
+
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        if not page["ids"]:
+            break
+
+        ids.extend(page["ids"])
+        embeddings.extend(page["embeddings"])
+        offset += len(page["ids"])
+
+    return ids, np.asarray(embeddings, dtype=np.float32)
+
+
+def migrate_collection(target_name: str, dimension: int, mode="truncate", page_size=500):
+    """
+    Function to copy the collection into a new collection of reduced-dimension vectors, truncated or re-embedded
+    """
+
+    if mode not in ("truncate", "reembed"):
+        raise ValueError(f"Unsupported migration mode: {mode}")
+    if target_name == collection.name:
+        raise ValueError("The target collection must differ from the source collection")
+
+    source = collection_backend()
+    if source is None:
+        raise ValueError(f"The collection {collection.name} is empty")
+
+    # Truncation keeps the source model, re-embedding uses the configured backend at the target dimension
+    if mode == "truncate":
+        if dimension > source["embedding_dimension"]:
+            raise ValueError(f"Cannot truncate {source['embedding_dimension']}-dimensional vectors to {dimension}")
+        backend = None
+        identity = {"embedding_backend": source["embedding_backend"], "embedding_model": source["embedding_model"]}
+    else:
+        backend = create_backend(settings.embedding_backend, dimension)
+        identity = {"embedding_backend": backend.name, "embedding_model": backend.model}
+
+    target = chromadb_client.get_or_create_collection(
+        name=target_name,
+        metadata={**identity, "embedding_dimension": dimension}
+    )
+    if target.count() > 0:
+        raise ValueError(f"The target collection {target_name} is not empty")
+
+    print(f"Migrating {collection.count()} chunks from {collection.name} to {target_name} ({mode}, {dimension} dims)")
+
+    start = time.perf_counter()
+    include = ["documents", "metadatas", "embeddings"] if mode == "truncate" else ["documents", "metadatas"]
+
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=include)
+        if not page["ids"]:
+            break
+
+        if mode == "truncate":
+            embeddings = truncate_matrix(np.asarray(page["embeddings"], dtype=np.float32), dimension)
+        else:
+            documents = page["documents"]
+            embeddings = []
+            for i in range(0, len(documents), settings.embedding_batch_size):
+                embeddings.extend(backend.embed(documents[i:i + settings.embedding_batch_size]))
+
+        target.add(ids=page["ids"], documents=page["documents"], embeddings=embeddings, metadatas=page["metadatas"])
+
+        offset += len(page["ids"])
+        print(f"Migrated {offset} chunks")
+
+    print(f"Migration finished in {time.perf_counter() - start:.1f}s")
+    print(f"Set CHROMA_COLLECTION_NAME={target_name} and EMBEDDING_DIMENSION={dimension} to serve from it")
+
+
+def run_report(dimensions=REPORT_DIMENSIONS, n_queries=100, n_results=10):
+    """
+    Function to report recall and query latency of truncated embeddings against the full vectors of the collection
+    """
+
+    ids, full = load_embeddings()
+    if len(ids) < 2:
+        print(f"The collection {collection.name} has too few chunks for a report")
+        return
+
+    n_results = min(n_results, len(ids) - 1)
+    full = truncate_matrix(full, full.shape[1])
+
+    # Use a fixed sample of stored chunks as queries
+    rng = np.random.default_rng(0)
+    query_indexes = rng.choice(len(ids), size=min(n_queries, len(ids)), replace=False)
+
+    # Exact top results at full dimension, excluding the query chunk itself, are the ground truth
+    scores = full[query_indexes] @ full.T
+    scores[np.arange(len(query_indexes)), query_indexes] = -np.inf
+    truth = np.argpartition(-scores, n_results, axis=1)[:, :n_results]
+    truth = [{ids[index] for index in row} for row in truth]
+
+    print(f"Corpus: {len(ids)} chunks, {full.shape[1]} dims, {len(query_indexes)} queries, recall@{n_results}")
+
+    client = chromadb.EphemeralClient()
+    for dimension in dimensions:
+        if dimension > full.shape[1]:
+            print(f"{dimension:>5} dims: skipped, the collection stores {full.shape[1]} dims")
+            continue
+
+        reduced = truncate_matrix(full, dimension)
+
+        # Build a throwaway HNSW index of the reduced vectors
+        report_collection = client.get_or_create_collection(name=f"report_{dimension}")
+        for i in range(0, len(ids), 1000):
+            report_collection.add(ids=ids[i:i + 1000], embeddings=reduced[i:i + 1000])
+
+        recalls, latencies = [], []
+        for query_number, index in enumerate(query_indexes):
+            start = time.perf_counter()
+            result = report_collection.query(query_embeddings=[reduced[index]], n_results=n_results + 1)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            retrieved = [chunk_id for chunk_id in result["ids"][0] if chunk_id != ids[index]][:n_results]
+            recalls.append(len(truth[query_number].intersection(retrieved)) / n_results)
+
+        client.delete_collection(name=f"report_{dimension}")
+
+        print(
+            f"{dimension:>5} dims: recall {np.mean(recalls):.3f}, "
+            f"p50 {np.percentile(latencies, 50):.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms, "
+            f"{reduced.nbytes / 1024 / 1024:.1f} MB of vectors"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate or evaluate reduced-dimension embeddings")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser("migrate", help="Copy the collection into a reduced-dimension collection")
+    migrate_parser.add_argument("target")
+    migrate_parser.add_argument("--dimension", type=int, required=True)
+    migrate_parser.add_argument("--mode", choices=("truncate", "reembed"), default="truncate")
+
+    report_parser = commands.add_parser("report", help="Compare recall and latency across dimensions")
+    report_parser.add_argument("--queries", type=int, default=100)
+    report_parser.add_argument("--results", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate_collection(args.target, args.dimension, args.mode)
+    else:
+        run_report(n_queries=args.queries, n_results=args.results)
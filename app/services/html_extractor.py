@@ -0,0 +1,184 @@
+# Import necessary libraries
+import os
+import sys
+import time
+from lxml import etree
+
+# Subtrees that never contain page content
+EXCLUDED_TAGS = {
+    'header', 'footer', 'form', 'input', 'textarea', 'button', 'select',
+    'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'head'
+}
+
+# Heading elements, kept even when short
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+# Elements that start and end a block of text
+BLOCK_TAGS = {
+    'p', 'div', 'li', 'ul', 'ol', 'dl', 'dt', 'dd', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'article', 'main', 'section', 'aside', 'blockquote', 'pre', 'table', 'tr', 'td', 'th',
+    'figcaption', 'br', 'hr', 'body'
+}
+
+
+def extract_blocks(root) -> list[dict]:
+    """
+    Function to walk an lxml tree once and return its text blocks in document order
+    """
+
+    blocks = []
+    parts = []
+    link_chars = 0
+    link_depth = 0
+    heading = False
+    heading_depth = 0
+
+    def end_block():
+        nonlocal parts, link_chars, heading
+
+        text = ' '.join(' '.join(parts).split())
+        if text:
+            blocks.append({'text': text, 'link_chars': link_chars, 'heading': heading})
+
+        parts = []
+        link_chars = 0
+        heading = False
+
+    def add_text(text):
+        nonlocal link_chars, heading
+
+        if text and not text.isspace():
+            parts.append(text)
+            if link_depth > 0:
+                link_chars += len(text.strip())
+            if heading_depth > 0:
+                heading = True
+
+    # Walk the tree once in document order, pruning excluded subtrees as they are entered
+    walker = etree.iterwalk(root, events=('start', 'end', 'comment', 'pi'))
+    for event, element in walker:
+        # Skip comments and processing instructions but keep their tail text
+        if event in ('comment', 'pi'):
+            add_text(element.tail)
+            continue
+
+        tag = element.tag.lower() if isinstance(element.tag, str) else None
+
+        # Skip excluded subtrees but keep their tail text
+        if tag is None or tag in EXCLUDED_TAGS:
+            if event == 'start':
+                walker.skip_subtree()
+            elif element is not root:
+                add_text(element.tail)
+            continue
+
+        if event == 'start':
+            if tag in BLOCK_TAGS:
+                end_block()
+            if tag == 'a':
+                link_depth += 1
+            if tag in HEADING_TAGS:
+                heading_depth += 1
+
+            add_text(element.text)
+
+        else:
+            if tag == 'a':
+                link_depth -= 1
+            if tag in HEADING_TAGS:
+                heading_depth -= 1
+            if tag in BLOCK_TAGS:
+                end_block()
+
+            # The tail text follows the element inside its parent
+            if element is not root:
+                add_text(element.tail)
+
+    end_block()
+    return blocks
+
+
+def is_boilerplate(block: dict, max_link_density=0.5, min_words=4) -> bool:
+    """
+    Function to flag navigation-like blocks that are mostly links or too short to carry content
+    """
+
+    text = block['text']
+    if block['link_chars'] / len(text) > max_link_density:
+        return True
+
+    return not block['heading'] and len(text.split()) < min_words
+
+
+def extract_text(root, drop_boilerplate=False) -> str:
+    """
+    Function to extract the text of an HTML page with one block per line
+    """
+
+    body = root.find('body')
+    blocks = extract_blocks(body if body is not None else root)
+
+    if drop_boilerplate:
+        blocks = [block for block in blocks if not is_boilerplate(block)]
+
+    return '\n'.join(block['text'] for block in blocks)
+
+
+def extract_text_xpath(selector) -> str:
+    """
+    Function to extract the text of an HTML page with the XPath union previously used by the spider
+    """
+
+    excluded_ancestors = [
+        'not(ancestor::header)',
+        'not(ancestor::footer)',
+        'not(ancestor::input)',
+        'not(ancestor::textarea)',
+        'not(ancestor::button)',
+    ]
+    exclusion = ' and '.join(excluded_ancestors)
+
+    selectors = [
+        f'//{tag}[{exclusion}]/text()'
+        for tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'span', 'div', 'li', 'article', 'main')
+    ]
+
+    text_contents = selector.xpath(' | '.join(selectors)).getall()
+    return ' '.join(text.strip().replace('\n', '') for text in text_contents if text.strip())
+
+
+def run_benchmark(fixtures_dir: str, rounds=5):
+    """
+    Function to compare pages/sec and output size of the XPath and single-pass extractors over saved HTML pages
+    """
+
+    from parsel import Selector
+
+    pages = []
+    for file_name in sorted(os.listdir(fixtures_dir)):
+        if file_name.endswith(('.html', '.htm')):
+            with open(os.path.join(fixtures_dir, file_name), 'r', encoding='utf-8', errors='replace') as buffer:
+                pages.append(Selector(text=buffer.read()))
+
+    if not pages:
+        print(f"No HTML fixtures found in {fixtures_dir}")
+        return
+
+    extractors = {
+        'xpath': extract_text_xpath,
+        'single_pass': lambda selector: extract_text(selector.root),
+        'single_pass_boilerplate': lambda selector: extract_text(selector.root, drop_boilerplate=True),
+    }
+
+    for name, extractor in extractors.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            output_size = sum(len(extractor(selector)) for selector in pages)
+        elapsed = time.perf_counter() - start
+
+        print(f"{name:>24}: {len(pages) * rounds / elapsed:10.1f} pages/sec, {output_size} output chars")
+
+
+if __name__ == "__main__":
+    # Default to the small fixture set committed next to this module
+    run_benchmark(sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "html_fixtures"))
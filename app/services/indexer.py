@@ -1,8 +1,20 @@
 # Import necessary libraries
-from app.services.embedding import generate_embedding
+import hashlib
+import itertools
+import threading
+from app.services.embedding import generate_embeddings, backend_identity
 from langchain_community.document_loaders import TextLoader, PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from app.clients.chromadb_client import collection
+from app.clients.chromadb_client import get_collection, validate_namespace, delete_collection
+from app.services.answer_cache import answer_cache
+from app.services.lexical_index import get_lexical_index, drop_lexical_index
+from app.services.pdf_loader import iter_pdf_chunks
+from app.services.crawl_state import crawl_state
+from app.services.vector_mirror import get_vector_mirror, drop_vector_mirror
+from config import settings
+
+# Serializes recording the embedding backend on the collections
+collection_backend_lock = threading.Lock()
 
 
 def load_file(file_path: str, file_extension: str):
@@ -30,54 +42,442 @@ def split_documents(documents, chunk_size, chunk_overlap):
     return text_splitter.split_documents(documents)
 
 
-def store_embeddings(split_docs, embeddings, file_name: str):
+def hash_chunk(content: str) -> str:
+    """
+    Function to compute the content hash stored in the metadata of each chunk
+    """
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def collection_backend(namespace=None) -> dict | None:
+    """
+    Function to get the embedding backend, model and dimension the collection of a namespace was built with
+    """
+
+    collection = get_collection(namespace)
+    metadata = collection.metadata or {}
+    if "embedding_backend" in metadata:
+        return {
+            "embedding_backend": metadata["embedding_backend"],
+            "embedding_model": metadata["embedding_model"],
+            "embedding_dimension": metadata["embedding_dimension"]
+        }
+
+    # Collections built before the backend was recorded were embedded with Gemini
+    sample = collection.get(limit=1, include=["embeddings"])
+    if len(sample["ids"]) == 0:
+        return None
+
+    return {
+        "embedding_backend": "gemini",
+        "embedding_model": "gemini-embedding-001",
+        "embedding_dimension": len(sample["embeddings"][0])
+    }
+
+
+def check_collection_backend(dimension=None, namespace=None):
+    """
+    Function to refuse vectors from another backend, model or dimension than the collection was built with
+    """
+
+    collection = get_collection(namespace)
+
+    with collection_backend_lock:
+        recorded = collection_backend(namespace)
+        current = backend_identity()
+        dimension = dimension or current["embedding_dimension"]
+
+        if recorded is not None:
+            if (recorded["embedding_backend"], recorded["embedding_model"]) != \
+                    (current["embedding_backend"], current["embedding_model"]):
+                raise ValueError(
+                    f"The collection was built with {recorded['embedding_backend']}/{recorded['embedding_model']} "
+                    f"but the configured embedding backend is {current['embedding_backend']}/{current['embedding_model']}"
+                )
+            if dimension is not None and dimension != recorded["embedding_dimension"]:
+                raise ValueError(
+                    f"The collection stores {recorded['embedding_dimension']}-dimensional vectors, "
+                    f"refusing {dimension}-dimensional vectors"
+                )
+
+            dimension = recorded["embedding_dimension"]
+
+        # Record the backend on the collection the first time vectors are stored
+        metadata = collection.metadata or {}
+        if dimension is not None and "embedding_backend" not in metadata:
+            metadata = {key: value for key, value in metadata.items() if not key.startswith("hnsw:")}
+            collection.modify(metadata={**metadata, **current, "embedding_dimension": dimension})
+
+
+def store_embeddings(ids, documents, embeddings, metadatas, namespace=None):
     """
-    Function to store embeddings in the ChromaDB collection
+    Function to store embeddings in the ChromaDB collection of a namespace
     """
 
-    ids = [f"{file_name}_{i}" for i in range(len(split_docs))]
-    documents = [doc.page_content for doc in split_docs]
-    metadata = [{"file_name": f"{file_name}", "chunk_index": i} for i in range(len(split_docs))]
+    # Never mix vectors from different embedding backends, queries merge the namespaces by score
+    if embeddings:
+        check_collection_backend(len(embeddings[0]), namespace)
 
-    # Add the documents and embeddings to the collection
-    collection.add(
+    # Upsert the documents and embeddings so changed chunks replace the stored ones
+    get_collection(namespace).upsert(
         ids=ids,
         documents=documents,
         embeddings=embeddings,
-        metadatas=metadata
+        metadatas=metadatas
     )
 
+    # Keep the lexical index and the vector mirror in sync with the collection
+    get_lexical_index(namespace).upsert(ids, documents, metadatas)
+    if settings.vector_mirror_enabled:
+        get_vector_mirror(namespace).upsert(ids, embeddings, metadatas, collection_backend(namespace))
+
+
+def remove_chunks(ids, namespace=None):
+    """
+    Function to remove chunks from the ChromaDB collection of a namespace by id
+    """
+
+    get_collection(namespace).delete(ids=ids)
+    get_lexical_index(namespace).delete(ids)
+    if settings.vector_mirror_enabled:
+        get_vector_mirror(namespace).delete(ids)
+
+
+def url_key(url: str) -> str:
+    """
+    Function to build a short stable key for a crawled page URL used in chunk ids
+    """
+
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def get_chunk_hashes(where: dict, namespace=None) -> dict:
+    """
+    Function to get the stored chunk hashes of the chunks matching a metadata filter
+    """
+
+    existing = get_collection(namespace).get(where=where, include=["metadatas"])
+
+    return {
+        chunk_id: (metadata or {}).get("chunk_hash")
+        for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])
+    }
+
+
+def apply_chunk_changes(ids, documents, metadatas, existing_hashes: dict, progress_callback=None, namespace=None):
+    """
+    Function to embed and write only the new or changed chunks and remove the stored chunks that are not in ids
+    """
+
+    hashes = [hash_chunk(document) for document in documents]
+
+    # Compare the new chunks with the stored ones
+    added, updated, changed_indexes = 0, 0, []
+    for i, (chunk_id, chunk_hash) in enumerate(zip(ids, hashes)):
+        if chunk_id not in existing_hashes:
+            added += 1
+            changed_indexes.append(i)
+        elif existing_hashes[chunk_id] != chunk_hash:
+            updated += 1
+            changed_indexes.append(i)
+
+    # Unchanged chunks count as already embedded for the progress report
+    total = len(ids)
+    unchanged = total - len(changed_indexes)
+    if progress_callback:
+        progress_callback(unchanged, total)
+
+    # Embed and upsert only the new or changed chunks
+    if changed_indexes:
+        embeddings = generate_embeddings(
+            [documents[i] for i in changed_indexes],
+            progress_callback=(lambda done, _: progress_callback(unchanged + done, total)) if progress_callback else None
+        )
+        store_embeddings(
+            [ids[i] for i in changed_indexes],
+            [documents[i] for i in changed_indexes],
+            embeddings,
+            [{**metadatas[i], "chunk_hash": hashes[i]} for i in changed_indexes],
+            namespace
+        )
+
+    # Remove the chunks that disappeared from the new version of the document
+    id_set = set(ids)
+    stale_ids = [chunk_id for chunk_id in existing_hashes if chunk_id not in id_set]
+    if stale_ids:
+        remove_chunks(stale_ids, namespace)
+
+    # Cached answers may be outdated once the knowledge base changes
+    if changed_indexes or stale_ids:
+        answer_cache.invalidate()
+
+    return {
+        "added": added,
+        "updated": updated,
+        "removed": len(stale_ids),
+        "unchanged": unchanged
+    }
+
+
+def make_chunk_id(file_name: str, doc, occurrences: dict) -> str:
+    """
+    Function to build a chunk id that stays the same when other parts of the document change
+    """
+
+    # PDF chunks are keyed by page and position within the page, other chunks by their content
+    if "page" in doc.metadata:
+        key = f"p{doc.metadata['page']}"
+    else:
+        key = hash_chunk(doc.page_content)[:16]
+
+    # Count repeated keys so identical chunks and chunks of the same page get distinct ids
+    occurrence = occurrences.get(key, 0)
+    occurrences[key] = occurrence + 1
+
+    return f"{file_name}_{key}_{occurrence}"
+
+
+def relabel_chunks(ids, documents, metadatas, namespace=None):
+    """
+    Function to update the metadata of stored chunks without embedding them again
+    """
+
+    get_collection(namespace).update(ids=ids, metadatas=metadatas)
+    get_lexical_index(namespace).upsert(ids, documents, metadatas)
+
+
+def sync_chunks(split_docs, file_name: str, incremental=True, progress_callback=None, namespace=None):
+    """
+    Function to embed and write only the new or changed chunks of a document and remove the stale ones
+    """
+
+    # Get the chunk hashes and positions already stored for the document
+    existing = get_collection(namespace).get(where={"file_name": file_name}, include=["metadatas"])
+    existing_metadatas = {
+        chunk_id: metadata or {}
+        for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])
+    }
+    existing_hashes = {chunk_id: metadata.get("chunk_hash") for chunk_id, metadata in existing_metadatas.items()}
+
+    # Without incremental mode every stored chunk is dropped and the document is indexed from scratch
+    result = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    if not incremental and existing_hashes:
+        remove_chunks(list(existing_hashes), namespace)
+        result["removed"] = len(existing_hashes)
+        existing_hashes = {}
+
+    # The chunks may come from a generator, so they are embedded in windows as they arrive
+    total = len(split_docs) if hasattr(split_docs, "__len__") else None
+    window_size = settings.embedding_batch_size * settings.embedding_max_workers
+    seen_ids = set()
+    occurrences = {}
+    chunk_index = 0
+
+    for window in itertools.batched(split_docs, window_size):
+        ids, documents, metadatas = [], [], []
+        for doc in window:
+            ids.append(make_chunk_id(file_name, doc, occurrences))
+            documents.append(doc.page_content)
+
+            # Keep the page number of PDF chunks
+            metadata = {"file_name": file_name, "chunk_index": chunk_index}
+            if "page" in doc.metadata:
+                metadata["page"] = doc.metadata["page"]
+            metadatas.append(metadata)
+
+            chunk_index += 1
+
+        seen_ids.update(ids)
+        window_existing = {chunk_id: existing_hashes[chunk_id] for chunk_id in ids if chunk_id in existing_hashes}
+
+        offset = chunk_index - len(ids)
+        window_callback = None
+        if progress_callback:
+            window_callback = lambda done, _: progress_callback(offset + done, total or chunk_index)
+
+        window_result = apply_chunk_changes(ids, documents, metadatas, window_existing, window_callback, namespace)
+        for key, value in window_result.items():
+            result[key] += value
 
-def add_document(file_path: str, file_name: str, file_extension: str, chunk_size=1000, chunk_overlap=200, sleep_time=0):
+        # Unchanged chunks that moved keep their embedding, only their position is updated for context merging
+        moved = [
+            i for i, chunk_id in enumerate(ids)
+            if chunk_id in window_existing
+            and window_existing[chunk_id] == hash_chunk(documents[i])
+            and existing_metadatas[chunk_id].get("chunk_index") != metadatas[i]["chunk_index"]
+        ]
+        if moved:
+            relabel_chunks(
+                [ids[i] for i in moved],
+                [documents[i] for i in moved],
+                [{**metadatas[i], "chunk_hash": window_existing[ids[i]]} for i in moved],
+                namespace
+            )
+            answer_cache.invalidate()
+
+    # Remove the chunks that disappeared from the new version of the document
+    stale_ids = [chunk_id for chunk_id in existing_hashes if chunk_id not in seen_ids]
+    if stale_ids:
+        remove_chunks(stale_ids, namespace)
+        answer_cache.invalidate()
+        result["removed"] += len(stale_ids)
+
+    print(f"Number of split documents: {chunk_index}")
+    return result
+
+
+def sync_pages(pages, file_name: str, namespace=None):
     """
-    Function to add a document to the sources of the RAG model
+    Function to index a micro-batch of crawled pages, given as (url, chunks) pairs, under a crawled document
     """
 
-    # Load the file
-    docs = load_file(file_path, file_extension)
+    ids, documents, metadatas = [], [], []
+    for url, chunks in pages:
+        for i, chunk in enumerate(chunks):
+            ids.append(f"{file_name}_{url_key(url)}_{i}")
+            documents.append(chunk)
+            metadatas.append({"file_name": file_name, "source_url": url, "chunk_index": i})
 
-    # Split the documents into chunks
-    split_docs = split_documents(docs, chunk_size, chunk_overlap)
-    print(f"Number of split documents: {len(split_docs)}")
+    # Get the chunk hashes already stored for these pages
+    existing_hashes = get_chunk_hashes({
+        "$and": [
+            {"file_name": file_name},
+            {"source_url": {"$in": [url for url, _ in pages]}}
+        ]
+    }, namespace)
+
+    return apply_chunk_changes(ids, documents, metadatas, existing_hashes, namespace=namespace)
+
+
+def remove_missing_pages(file_name: str, crawled_urls: set, namespace=None) -> int:
+    """
+    Function to remove the chunks of a crawled document whose page was not crawled again
+    """
+
+    existing = get_collection(namespace).get(where={"file_name": file_name}, include=["metadatas"])
+    stale_ids = [
+        chunk_id
+        for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])
+        if (metadata or {}).get("source_url") not in crawled_urls
+    ]
+
+    if stale_ids:
+        remove_chunks(stale_ids, namespace)
+        answer_cache.invalidate()
+
+    return len(stale_ids)
+
+
+def add_document(file_path: str, file_name: str, file_extension: str, chunk_size=1000, chunk_overlap=200, sleep_time=0, incremental=True, progress_callback=None, namespace=None):
+    """
+    Function to add a document to the sources of the RAG model in a namespace
+    """
 
-    # Generate embeddings for each document
-    embeddings = []
+    if file_extension == ".pdf":
+        # Parse and split the PDF pages in parallel, chunks are embedded while parsing continues
+        split_docs = iter_pdf_chunks(file_path, chunk_size, chunk_overlap)
+    else:
+        # Load the file
+        docs = load_file(file_path, file_extension)
 
-    for index, doc in enumerate(split_docs):
-        print(f"Generating embeddings for document {index + 1}/{len(split_docs)}...")
+        # Split the documents into chunks
+        split_docs = split_documents(docs, chunk_size, chunk_overlap)
 
-        embedding = generate_embedding(doc.page_content)
-        embeddings.append(embedding)
+    # Embed and store the new or changed chunks
+    result = sync_chunks(split_docs, f"{file_name}{file_extension}", incremental, progress_callback, namespace)
+    print(f"Indexing result for {file_name}{file_extension}: {result}")
 
-    # Store the embeddings
-    store_embeddings(split_docs, embeddings, f"{file_name}{file_extension}")
+    return result
 
 
-def delete_document(file_name: str):
+def delete_document(file_name: str, namespace=None):
     """
     Function to delete a document from the sources of the RAG model
     """
 
-    # Delete the document from the collection
-    collection.delete(where={"file_name": file_name})
+    # Delete the document from the collection of its namespace
+    get_collection(namespace).delete(where={"file_name": file_name})
+    get_lexical_index(namespace).delete_file(file_name)
+    if settings.vector_mirror_enabled:
+        get_vector_mirror(namespace).delete_file(file_name)
+    crawl_state.delete_file(file_name)
+    answer_cache.invalidate()
     print(f"Document {file_name} deleted successfully")
+
+
+def drop_namespace(namespace: str):
+    """
+    Function to drop a namespace by deleting its collection, lexical index and vector mirror as a whole
+    """
+
+    namespace = validate_namespace(namespace)
+
+    delete_collection(namespace)
+    drop_lexical_index(namespace)
+    drop_vector_mirror(namespace)
+    crawl_state.delete_namespace(namespace)
+    answer_cache.invalidate()
+    print(f"Namespace {namespace} dropped successfully")
+
+
+def backfill_lexical_index(page_size=1000, namespace=None):
+    """
+    Function to build the lexical index from the collection when it was created before the index existed
+    """
+
+    collection = get_collection(namespace)
+    lexical_index = get_lexical_index(namespace)
+
+    if lexical_index.count() > 0 or collection.count() == 0:
+        return
+
+    print("Building the lexical index from the ChromaDB collection...")
+
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        if not page["ids"]:
+            break
+
+        lexical_index.upsert(page["ids"], page["documents"], page["metadatas"])
+        offset += len(page["ids"])
+
+    print(f"Lexical index built with {offset} chunks")
+
+
+def sync_vector_mirror(page_size=1000, namespace=None):
+    """
+    Function to rebuild the vector mirror from the collection when it is enabled and out of sync
+    """
+
+    if not settings.vector_mirror_enabled:
+        return
+
+    collection = get_collection(namespace)
+    vector_mirror = get_vector_mirror(namespace)
+    backend = collection_backend(namespace)
+
+    # Matching counts are not enough after a migration to another dimension or backend
+    if vector_mirror.size == collection.count() and (
+        vector_mirror.size == 0
+        or (vector_mirror.dimension == backend["embedding_dimension"] and vector_mirror.backend == backend)
+    ):
+        return
+
+    print(
+        f"Rebuilding the vector mirror from the ChromaDB collection "
+        f"({vector_mirror.size} chunks of {vector_mirror.backend}, collection has {collection.count()} of {backend})..."
+    )
+    vector_mirror.clear()
+
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+        if not page["ids"]:
+            break
+
+        vector_mirror.upsert(page["ids"], page["embeddings"], page["metadatas"], backend)
+        offset += len(page["ids"])
+
+    print(f"Vector mirror rebuilt with {offset} chunks")
@@ -0,0 +1,248 @@
+# Import necessary libraries
+import os
+import json
+import uuid
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from app.services.indexer import add_document
+from config import settings
+
+
+class JobQueue:
+    """
+    A persistent ingestion job queue processed by a pool of worker threads
+    """
+
+    def __init__(self, path: str, workers: int):
+        """
+        Initialize the job database, the in-memory queue and the worker pool size
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.workers = workers
+        self.queue = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "status TEXT NOT NULL, "
+            "file_path TEXT NOT NULL, "
+            "file_name TEXT NOT NULL, "
+            "file_extension TEXT NOT NULL, "
+            "chunk_size INTEGER NOT NULL, "
+            "chunk_overlap INTEGER NOT NULL, "
+            "chunks_embedded INTEGER NOT NULL DEFAULT 0, "
+            "chunks_total INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT, "
+            "error TEXT, "
+            "created_at TEXT NOT NULL, "
+            "updated_at TEXT NOT NULL, "
+            f"namespace TEXT NOT NULL DEFAULT '{settings.default_namespace}', "
+            "content_hash TEXT)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_file_name ON jobs (file_name, file_extension)")
+
+        # Jobs created before namespaces existed index into the default namespace
+        columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(jobs)")]
+        if "namespace" not in columns:
+            self.connection.execute(
+                f"ALTER TABLE jobs ADD COLUMN namespace TEXT NOT NULL DEFAULT '{settings.default_namespace}'"
+            )
+
+        # Add the content hash column to databases created before it existed
+        if "content_hash" not in columns:
+            self.connection.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_content_hash ON jobs (content_hash, status)")
+        self.connection.commit()
+
+    def update(self, job_id: str, **fields):
+        """
+        Method to update the stored fields of a job
+        """
+
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+
+        with self.lock:
+            self.connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+            self.connection.commit()
+
+    def submit(self, file_path: str, file_name: str, file_extension: str, chunk_size=1000, chunk_overlap=200,
+               namespace=None, content_hash=None) -> dict:
+        """
+        Method to queue an ingestion job into a namespace, joining an unfinished job for the same content
+        """
+
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        namespace = namespace or settings.default_namespace
+
+        with self.lock:
+            # The same content of the same document is already queued or being indexed
+            if content_hash is not None:
+                row = self.connection.execute(
+                    "SELECT * FROM jobs WHERE content_hash = ? AND status IN ('queued', 'running') "
+                    "AND file_name = ? AND file_extension = ? AND namespace = ? AND chunk_size = ? "
+                    "AND chunk_overlap = ? ORDER BY created_at DESC LIMIT 1",
+                    (content_hash, file_name, file_extension, namespace, chunk_size, chunk_overlap)
+                ).fetchone()
+
+                if row is not None:
+                    print(f"Joining ingestion job {row['id']} for {file_name}{file_extension}")
+                    return {**self.to_dict(row), "joined": True}
+
+            self.connection.execute(
+                "INSERT INTO jobs (id, status, file_path, file_name, file_extension, chunk_size, chunk_overlap, "
+                "namespace, content_hash, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, file_path, file_name, file_extension, chunk_size, chunk_overlap,
+                    namespace, content_hash, now, now
+                )
+            )
+            self.connection.commit()
+
+        self.queue.put(job_id)
+        return {**self.get(job_id), "joined": False}
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        Method to get the status, progress and result of a job
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        return self.to_dict(row) if row else None
+
+    def latest_job(self, file_name: str, file_extension: str) -> dict | None:
+        """
+        Method to get the most recent job of a document
+        """
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE file_name = ? AND file_extension = ? ORDER BY created_at DESC LIMIT 1",
+                (file_name, file_extension)
+            ).fetchone()
+
+        return self.to_dict(row) if row else None
+
+    def list_jobs(self, limit=50) -> list[dict]:
+        """
+        Method to list the most recent jobs
+        """
+
+        with self.lock:
+            rows = self.connection.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+
+        return [self.to_dict(row) for row in rows]
+
+    @staticmethod
+    def to_dict(row) -> dict:
+        """
+        Method to convert a job row to the API representation
+        """
+
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "file_name": row["file_name"],
+            "file_extension": row["file_extension"],
+            "namespace": row["namespace"],
+            "content_hash": row["content_hash"],
+            "progress": {
+                "chunks_embedded": row["chunks_embedded"],
+                "chunks_total": row["chunks_total"]
+            },
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def run_job(self, job_id: str):
+        """
+        Method to run a single ingestion job and record its outcome
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        if row is None:
+            return
+
+        self.update(job_id, status="running", error=None)
+        print(f"Running ingestion job {job_id} for {row['file_name']}{row['file_extension']}")
+
+        try:
+            result = add_document(
+                row["file_path"],
+                row["file_name"],
+                row["file_extension"],
+                row["chunk_size"],
+                row["chunk_overlap"],
+                progress_callback=lambda done, total: self.update(job_id, chunks_embedded=done, chunks_total=total),
+                namespace=row["namespace"]
+            )
+            self.update(job_id, status="completed", result=json.dumps(result))
+
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            self.update(job_id, status="failed", error=str(e))
+
+    def worker(self):
+        """
+        Method run by each worker thread to process jobs from the queue
+        """
+
+        while True:
+            job_id = self.queue.get()
+            if job_id is None:
+                break
+
+            self.run_job(job_id)
+
+    def start(self):
+        """
+        Method to resume the unfinished jobs and start the worker threads
+        """
+
+        # Re-queue the jobs that were queued or running when the server stopped
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+
+        for row in rows:
+            print(f"Resuming ingestion job {row['id']}")
+            self.update(row["id"], status="queued")
+            self.queue.put(row["id"])
+
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self.worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """
+        Method to stop the worker threads after their current job
+        """
+
+        for _ in self.threads:
+            self.queue.put(None)
+
+        self.threads = []
+
+
+# Create the ingestion job queue instance
+job_queue = JobQueue(settings.jobs_db_path, settings.ingestion_workers)
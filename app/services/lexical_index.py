@@ -0,0 +1,277 @@
+# Import necessary libraries
+import os
+import re
+import math
+import json
+import sqlite3
+import threading
+from collections import Counter
+from config import settings
+
+# Pattern used to split text into lowercase word tokens
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Function to split a text into lowercase word tokens
+    """
+
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """
+    A BM25 inverted index of the chunks stored in SQLite next to the ChromaDB collection
+    """
+
+    def __init__(self, path: str, k1=1.5, b=0.75, max_df_ratio=None, max_df_min_chunks=None):
+        """
+        Initialize the index database and the BM25 parameters
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = max_df_ratio or settings.lexical_max_df_ratio
+        self.max_df_min_chunks = max_df_min_chunks or settings.lexical_max_df_min_chunks
+        self.corpus_stats = None
+        self.document_frequencies = {}
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, "
+            "file_name TEXT NOT NULL, "
+            "document TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, "
+            "length INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_name ON chunks (file_name)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, "
+            "chunk_id TEXT NOT NULL, "
+            "tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, chunk_id)) WITHOUT ROWID"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk_id ON postings (chunk_id)")
+        self.connection.commit()
+
+    def delete_ids(self, ids: list[str]):
+        """
+        Method to delete chunks and their postings by id, must be called with the lock held
+        """
+
+        for i in range(0, len(ids), 500):
+            id_slice = ids[i:i + 500]
+            placeholders = ",".join("?" * len(id_slice))
+            self.connection.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", id_slice)
+            self.connection.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", id_slice)
+
+    def upsert(self, ids: list[str], documents: list[str], metadatas: list[dict]):
+        """
+        Method to add or replace chunks in the index
+        """
+
+        chunk_rows = []
+        posting_rows = []
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            tokens = tokenize(document)
+            chunk_rows.append((chunk_id, metadata["file_name"], document, json.dumps(metadata), len(tokens)))
+            posting_rows.extend((term, chunk_id, tf) for term, tf in Counter(tokens).items())
+
+        with self.lock:
+            self.delete_ids(ids)
+            self.connection.executemany(
+                "INSERT INTO chunks (id, file_name, document, metadata, length) VALUES (?, ?, ?, ?, ?)",
+                chunk_rows
+            )
+            self.connection.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            self.connection.commit()
+            self.corpus_stats = None
+            self.document_frequencies = {}
+
+    def delete(self, ids: list[str]):
+        """
+        Method to delete chunks from the index by id
+        """
+
+        with self.lock:
+            self.delete_ids(ids)
+            self.connection.commit()
+            self.corpus_stats = None
+            self.document_frequencies = {}
+
+    def delete_file(self, file_name: str):
+        """
+        Method to delete all the chunks of a document from the index
+        """
+
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE file_name = ?)",
+                (file_name,)
+            )
+            self.connection.execute("DELETE FROM chunks WHERE file_name = ?", (file_name,))
+            self.connection.commit()
+            self.corpus_stats = None
+            self.document_frequencies = {}
+
+    def close(self):
+        """
+        Method to close the index database
+        """
+
+        with self.lock:
+            self.connection.close()
+
+    def count(self) -> int:
+        """
+        Method to return the number of indexed chunks
+        """
+
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get_chunks(self, ids: list[str]) -> dict:
+        """
+        Method to get the text and metadata of chunks by id
+        """
+
+        chunks = {}
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                id_slice = ids[i:i + 500]
+                rows = self.connection.execute(
+                    f"SELECT id, document, metadata FROM chunks WHERE id IN ({','.join('?' * len(id_slice))})",
+                    id_slice
+                ).fetchall()
+                chunks.update((chunk_id, (document, json.loads(metadata))) for chunk_id, document, metadata in rows)
+
+        return chunks
+
+    def search(self, query: str, n_results: int, file_name=None) -> list[dict]:
+        """
+        Method to return the top chunks for a query ranked by BM25 score, optionally within one document
+        """
+
+        terms = list(set(tokenize(query)))
+        if not terms:
+            return []
+
+        with self.lock:
+            # Corpus statistics are cached until the next write
+            if self.corpus_stats is None:
+                self.corpus_stats = self.connection.execute(
+                    "SELECT COUNT(*), COALESCE(AVG(length), 0) FROM chunks"
+                ).fetchone()
+            total_chunks, average_length = self.corpus_stats
+
+            # Document frequencies are cached per term until the next write
+            missing = [term for term in terms if term not in self.document_frequencies]
+            if missing:
+                if len(self.document_frequencies) > 100000:
+                    self.document_frequencies = {}
+                self.document_frequencies.update(dict.fromkeys(missing, 0))
+                self.document_frequencies.update(self.connection.execute(
+                    f"SELECT term, COUNT(*) FROM postings WHERE term IN ({','.join('?' * len(missing))}) "
+                    f"GROUP BY term",
+                    missing
+                ).fetchall())
+            document_frequencies = {term: self.document_frequencies[term] for term in terms}
+
+            found = {term: df for term, df in document_frequencies.items() if df > 0}
+            if not found:
+                return []
+
+            # Terms found in most chunks of a large corpus barely change the ranking but match almost every posting,
+            # so they are skipped, keeping the rarest term when the query has nothing else
+            terms = list(found)
+            if total_chunks >= self.max_df_min_chunks:
+                terms = [term for term, df in found.items() if df <= self.max_df_ratio * total_chunks]
+                if not terms:
+                    terms = [min(found, key=found.get)]
+
+            # The corpus statistics stay global, only the matching postings are restricted to the document
+            sql = (
+                f"SELECT p.chunk_id, p.term, p.tf, c.length FROM postings p "
+                f"JOIN chunks c ON c.id = p.chunk_id WHERE p.term IN ({','.join('?' * len(terms))})"
+            )
+            if file_name is not None:
+                sql += " AND c.file_name = ?"
+            rows = self.connection.execute(sql, terms + [file_name] if file_name is not None else terms).fetchall()
+
+        # Accumulate the BM25 score of every matching chunk
+        scores = Counter()
+        for chunk_id, term, tf, length in rows:
+            df = document_frequencies[term]
+            idf = math.log(1 + (total_chunks - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * length / (average_length or 1))
+            scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = scores.most_common(n_results)
+        if not top:
+            return []
+
+        # Load the text and metadata of the top chunks
+        chunks = self.get_chunks([chunk_id for chunk_id, _ in top])
+
+        return [
+            {"id": chunk_id, "document": chunks[chunk_id][0], "metadata": chunks[chunk_id][1], "score": score}
+            for chunk_id, score in top
+        ]
+
+
+# Create the lexical index instance
+lexical_index = LexicalIndex(settings.lexical_index_path)
+
+# Lexical indexes of the namespaces, each in its own database next to the default one
+lexical_indexes = {settings.default_namespace: lexical_index}
+lexical_indexes_lock = threading.Lock()
+
+
+def namespace_index_path(namespace: str) -> str:
+    """
+    Function to build the database path of the lexical index of a namespace
+    """
+
+    if namespace == settings.default_namespace:
+        return settings.lexical_index_path
+
+    root, extension = os.path.splitext(settings.lexical_index_path)
+    return f"{root}.{namespace}{extension}"
+
+
+def get_lexical_index(namespace=None) -> LexicalIndex:
+    """
+    Function to get or create the lexical index of a namespace
+    """
+
+    namespace = namespace or settings.default_namespace
+
+    with lexical_indexes_lock:
+        if namespace not in lexical_indexes:
+            lexical_indexes[namespace] = LexicalIndex(namespace_index_path(namespace))
+
+        return lexical_indexes[namespace]
+
+
+def drop_lexical_index(namespace: str):
+    """
+    Function to close and remove the database of the lexical index of a namespace
+    """
+
+    with lexical_indexes_lock:
+        index = lexical_indexes.pop(namespace, None)
+
+    if index is not None:
+        index.close()
+
+    path = namespace_index_path(namespace)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
@@ -0,0 +1,105 @@
+# Import necessary libraries
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader, PdfWriter
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from config import settings
+
+
+def extract_page_range(file_path: str, start: int, end: int, chunk_size: int, chunk_overlap: int):
+    """
+    Function to extract and chunk the text of a range of PDF pages, run in a worker process
+    """
+
+    reader = PdfReader(file_path)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    chunks = []
+    for page_number in range(start, end):
+        text = reader.pages[page_number].extract_text() or ""
+        chunks.extend((page_number, chunk) for chunk in text_splitter.split_text(text))
+
+    return chunks
+
+
+def iter_pdf_chunks(file_path: str, chunk_size: int, chunk_overlap: int, pages_per_task=None, max_workers=None):
+    """
+    Function to yield the chunks of a PDF in page order while page ranges are parsed in a process pool
+    """
+
+    pages_per_task = pages_per_task or settings.pdf_pages_per_task
+    max_workers = max_workers or settings.pdf_max_workers or os.cpu_count() or 1
+
+    page_count = len(PdfReader(file_path).pages)
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    print(f"Parsing {page_count} PDF pages in {len(ranges)} page ranges")
+
+    # Small documents and single-core machines are not worth starting worker processes for
+    if len(ranges) <= 1 or max_workers <= 1:
+        for page_number, chunk in extract_page_range(file_path, 0, page_count, chunk_size, chunk_overlap):
+            yield Document(page_content=chunk, metadata={"page": page_number})
+        return
+
+    # Spawn the workers so they do not inherit the threads and connections of the server
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(extract_page_range, file_path, start, end, chunk_size, chunk_overlap)
+            for start, end in ranges
+        ]
+
+        # Yield each range as soon as it and the ranges before it are done
+        for future in futures:
+            for page_number, chunk in future.result():
+                yield Document(page_content=chunk, metadata={"page": page_number})
+
+
+def run_benchmark(file_path: str, copies=50, chunk_size=1000, chunk_overlap=200):
+    """
+    Function to compare serial and parallel loading and chunking over a large PDF generated from a sample PDF
+    """
+
+    from langchain_community.document_loaders import PyPDFLoader
+
+    # Generate a large PDF by repeating the pages of the sample PDF
+    writer = PdfWriter()
+    sample = PdfReader(file_path)
+    for _ in range(copies):
+        for page in sample.pages:
+            writer.add_page(page)
+
+    temp_fd, large_path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(temp_fd, 'wb') as buffer:
+        writer.write(buffer)
+
+    try:
+        page_count = len(PdfReader(large_path).pages)
+
+        start = time.perf_counter()
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        serial_chunks = text_splitter.split_documents(PyPDFLoader(large_path).load())
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_chunk_time = None
+        parallel_count = 0
+        for _ in iter_pdf_chunks(large_path, chunk_size, chunk_overlap):
+            if first_chunk_time is None:
+                first_chunk_time = time.perf_counter() - start
+            parallel_count += 1
+        parallel_time = time.perf_counter() - start
+
+        print(f"Pages: {page_count}")
+        print(f"Serial:   {len(serial_chunks)} chunks in {serial_time:.2f}s")
+        print(f"Parallel: {parallel_count} chunks in {parallel_time:.2f}s, first chunk after {first_chunk_time:.2f}s")
+
+    finally:
+        os.remove(large_path)
+
+
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 50)
@@ -0,0 +1,81 @@
+# Import necessary libraries
+import threading
+import numpy as np
+from config import settings
+
+
+def mmr_select(query_embedding, embeddings, k: int, lambda_mult: float) -> list[int]:
+    """
+    Function to pick the indexes of k relevant but mutually diverse candidates with maximal marginal relevance
+    """
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1)
+
+    # Score every candidate against the query and against every other candidate at once
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+
+    selected = [int(np.argmax(relevance))]
+    available = np.ones(len(matrix), dtype=bool)
+    available[selected[0]] = False
+    max_similarity = similarity[selected[0]].copy()
+
+    while len(selected) < min(k, len(matrix)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
+
+
+class CrossEncoderReranker:
+    """
+    A local cross-encoder that scores query and chunk pairs jointly to reorder retrieved chunks
+    """
+
+    def __init__(self, model_name: str):
+        """
+        Initialize the reranker, the model itself is loaded on first use
+        """
+
+        self.model_name = model_name
+        self.model = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        Method to load the cross-encoder model once
+        """
+
+        with self.lock:
+            if self.model is None:
+                from sentence_transformers import CrossEncoder
+
+                print(f"Loading the reranker model {self.model_name}")
+                self.model = CrossEncoder(self.model_name, device="cpu")
+
+        return self.model
+
+    def rerank(self, query: str, chunks: list[dict], k: int) -> list[dict]:
+        """
+        Method to return the k chunks with the highest cross-encoder scores for the query
+        """
+
+        if not chunks:
+            return []
+
+        scores = self.load().predict([(query, chunk["document"]) for chunk in chunks])
+        order = np.argsort(-np.asarray(scores))[:k]
+        return [chunks[i] for i in order]
+
+
+# Create the reranker instance
+reranker = CrossEncoderReranker(settings.reranker_model)
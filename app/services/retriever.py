@@ -1,29 +1,362 @@
 # Import necessary libraries
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from google.genai import types
 from app.clients.gemini_client import gemini_client
-from app.services.embedding import generate_embedding
-from app.clients.chromadb_client import collection
+from app.services.embedding import generate_embedding, generate_embedding_async, generate_embeddings
+from app.services.answer_cache import answer_cache
+from app.services.coalescing import query_coalescer
+from app.services.lexical_index import get_lexical_index
+from app.services.vector_mirror import get_vector_mirror
+from app.services.reranker import mmr_select, reranker
+from app.services.context_builder import build_context
+from app.clients.chromadb_client import get_collection, validate_namespace
+from config import settings
 
 
-def retrieve_documents(query: str):
+def embed_query(query: str):
     """
-    Function to retrieve documents based on a query
+    Function to embed a query, returning None when the embedding service is down
     """
 
-    query_embeddings = generate_embedding(query)
+    try:
+        return generate_embedding(query)
+    except Exception as e:
+        print(f"Query embedding failed, falling back to lexical retrieval: {e}")
+        return None
 
-    results = collection.query(
-        query_embeddings=query_embeddings,
-        n_results=3,
-        include=["documents", "metadatas"]
+
+async def embed_query_async(query: str):
+    """
+    Function to embed a query, returning None when the embedding service is slow or down
+    """
+
+    try:
+        return await asyncio.wait_for(generate_embedding_async(query), settings.embedding_timeout_seconds)
+    except Exception as e:
+        print(f"Query embedding failed or timed out, falling back to lexical retrieval: {e!r}")
+        return None
+
+
+def chroma_score(distance: float) -> float:
+    """
+    Function to convert a ChromaDB distance to the cosine similarity the vector mirror returns
+    """
+
+    # The collections use squared L2 distance, which is 2 - 2 cos for the normalized embeddings
+    return 1.0 - distance / 2.0
+
+
+def vector_search_many(query_embeddings_list, n_results: int, include_embeddings=False,
+                       namespace=None) -> list[list[dict]]:
+    """
+    Function to return the nearest chunks of a namespace to many query embeddings with a single vector lookup
+    """
+
+    namespace = validate_namespace(namespace)
+    vector_mirror = get_vector_mirror(namespace) if settings.vector_mirror_enabled else None
+
+    # Use the in-process mirror unless the corpus has outgrown exact search
+    if vector_mirror is not None and 0 < vector_mirror.size <= settings.vector_mirror_max_chunks:
+        hits_list = vector_mirror.search_many(query_embeddings_list, n_results)
+        chunk_ids = list({chunk_id for hits in hits_list for chunk_id, _ in hits})
+        chunks = get_lexical_index(namespace).get_chunks(chunk_ids)
+        vectors = vector_mirror.get_vectors(chunk_ids) if include_embeddings else {}
+
+        return [
+            [
+                {"id": chunk_id, "document": chunks[chunk_id][0], "metadata": chunks[chunk_id][1],
+                 "embedding": vectors.get(chunk_id), "score": score, "namespace": namespace}
+                for chunk_id, score in hits if chunk_id in chunks
+            ]
+            for hits in hits_list
+        ]
+
+    results = get_collection(namespace).query(
+        query_embeddings=query_embeddings_list,
+        n_results=n_results,
+        include=["documents", "metadatas", "distances", "embeddings"] if include_embeddings
+        else ["documents", "metadatas", "distances"]
     )
 
-    return results['documents'][0]
+    result_lists = []
+    for index, ids in enumerate(results["ids"]):
+        embeddings = results["embeddings"][index] if include_embeddings else [None] * len(ids)
+        result_lists.append([
+            {"id": chunk_id, "document": document, "metadata": metadata, "embedding": embedding,
+             "score": chroma_score(distance), "namespace": namespace}
+            for chunk_id, document, metadata, embedding, distance in zip(
+                ids, results["documents"][index], results["metadatas"][index], embeddings,
+                results["distances"][index]
+            )
+        ])
 
+    return result_lists
 
-def retrieve_and_generate(query: str, short: bool):
+
+def vector_search(query_embeddings, n_results: int, file_name=None, include_embeddings=False,
+                  namespace=None) -> list[dict]:
     """
-    Function to retrieve documents based on a query and generate a response using the Gemini model
+    Function to return the nearest chunks of a namespace to a query embedding, optionally within one document
+    """
+
+    if file_name is None:
+        return vector_search_many([query_embeddings], n_results, include_embeddings, namespace)[0]
+
+    namespace = validate_namespace(namespace)
+    vector_mirror = get_vector_mirror(namespace) if settings.vector_mirror_enabled else None
+
+    # Scoring only the rows of one document beats a filtered HNSW query at any corpus size
+    if vector_mirror is not None and vector_mirror.size > 0:
+        hits = vector_mirror.search(query_embeddings, n_results, file_name)
+        chunks = get_lexical_index(namespace).get_chunks([chunk_id for chunk_id, _ in hits])
+        vectors = vector_mirror.get_vectors([chunk_id for chunk_id, _ in hits]) if include_embeddings else {}
+
+        return [
+            {"id": chunk_id, "document": chunks[chunk_id][0], "metadata": chunks[chunk_id][1],
+             "embedding": vectors.get(chunk_id), "score": score, "namespace": namespace}
+            for chunk_id, score in hits if chunk_id in chunks
+        ]
+
+    results = get_collection(namespace).query(
+        query_embeddings=[query_embeddings],
+        n_results=n_results,
+        where={"file_name": file_name},
+        include=["documents", "metadatas", "distances", "embeddings"] if include_embeddings
+        else ["documents", "metadatas", "distances"]
+    )
+    embeddings = results["embeddings"][0] if include_embeddings else [None] * len(results["ids"][0])
+
+    return [
+        {"id": chunk_id, "document": document, "metadata": metadata, "embedding": embedding,
+         "score": chroma_score(distance), "namespace": namespace}
+        for chunk_id, document, metadata, embedding, distance in zip(
+            results['ids'][0], results['documents'][0], results['metadatas'][0], embeddings,
+            results['distances'][0]
+        )
+    ]
+
+
+def lexical_search(query: str, n_results: int, namespace=None, file_name=None) -> list[dict]:
+    """
+    Function to return the top chunks of a namespace for a query ranked by BM25 score, optionally within one document
+    """
+
+    namespace = validate_namespace(namespace)
+    results = get_lexical_index(namespace).search(query, n_results, file_name)
+    for chunk in results:
+        chunk["namespace"] = namespace
+
+    return results
+
+
+def load_embeddings(chunks: list[dict]):
+    """
+    Function to fill in the embeddings of candidate chunks that only came from the lexical index
+    """
+
+    # Group the missing ids by the namespace they were found in
+    missing = {}
+    for chunk in chunks:
+        if chunk.get("embedding") is None:
+            missing.setdefault(chunk.get("namespace"), []).append(chunk["id"])
+
+    for namespace, missing_ids in missing.items():
+        stored = get_collection(namespace).get(ids=missing_ids, include=["embeddings"])
+        embeddings = dict(zip(stored["ids"], stored["embeddings"]))
+        for chunk in chunks:
+            if chunk.get("embedding") is None and chunk.get("namespace") == namespace:
+                chunk["embedding"] = embeddings.get(chunk["id"])
+
+
+def chunk_key(chunk: dict) -> tuple:
+    """
+    Function to build the key identifying a chunk across namespaces
+    """
+
+    return chunk.get("namespace"), chunk["id"]
+
+
+def fuse_results(result_lists: list[list[dict]], n_results: int) -> list[dict]:
+    """
+    Function to merge ranked result lists with reciprocal-rank fusion
+    """
+
+    scores = {}
+    chunks = {}
+    for results in result_lists:
+        for rank, chunk in enumerate(results):
+            key = chunk_key(chunk)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (settings.rrf_k + rank + 1)
+            chunks.setdefault(key, chunk)
+
+    ranked_keys = sorted(scores, key=scores.get, reverse=True)[:n_results]
+    return [chunks[key] for key in ranked_keys]
+
+
+def merge_by_score(result_lists: list[list[dict]], n_results: int) -> list[dict]:
+    """
+    Function to merge the ranked results of several namespaces into one top-k list by score
+    """
+
+    if len(result_lists) == 1:
+        return result_lists[0][:n_results]
+
+    merged = [chunk for results in result_lists for chunk in results]
+    return sorted(merged, key=lambda chunk: chunk["score"], reverse=True)[:n_results]
+
+
+def resolve_namespaces(namespaces=None) -> list[str]:
+    """
+    Function to validate the namespaces of a query, defaulting to the default namespace
+    """
+
+    return list(dict.fromkeys(validate_namespace(namespace) for namespace in namespaces or [None]))
+
+
+def fan_out(function, namespaces: list[str]) -> list:
+    """
+    Function to run a retrieval function for every namespace, in parallel when there are several
+    """
+
+    if len(namespaces) == 1:
+        return [function(namespaces[0])]
+
+    with ThreadPoolExecutor(max_workers=min(len(namespaces), settings.namespace_fanout_workers)) as executor:
+        return list(executor.map(function, namespaces))
+
+
+def select_results(query: str, query_embeddings, vector_results, lexical_results, n_results: int,
+                   timings: dict) -> list[dict]:
+    """
+    Function to fuse the candidates of a query, diversify them with MMR and optionally rerank them before picking k
+    """
+
+    # Lexical only without a query embedding
+    if query_embeddings is None:
+        candidates = lexical_results
+    else:
+        candidates = fuse_results([vector_results, lexical_results], settings.hybrid_candidates)
+
+    # Number of chunks kept for the reranker, or the final k without one
+    keep = max(n_results, settings.reranker_candidates) if settings.reranker_enabled else n_results
+
+    # Drop near-duplicate chunks from overlapping splits while keeping relevance
+    if settings.mmr_enabled and query_embeddings is not None and len(candidates) > keep:
+        start = time.perf_counter()
+        load_embeddings(candidates)
+        candidates = [chunk for chunk in candidates if chunk.get("embedding") is not None]
+        selected = mmr_select(query_embeddings, [chunk["embedding"] for chunk in candidates], keep, settings.mmr_lambda)
+        candidates = [candidates[i] for i in selected]
+        timings["mmr_ms"] = (time.perf_counter() - start) * 1000
+
+    if settings.reranker_enabled:
+        start = time.perf_counter()
+        candidates = reranker.rerank(query, candidates, n_results)
+        timings["rerank_ms"] = (time.perf_counter() - start) * 1000
+
+    return candidates[:n_results]
+
+
+def search(query: str, query_embeddings, n_results=None, timings=None, namespaces=None, file_name=None) -> list[dict]:
+    """
+    Function to over-fetch hybrid candidates from the namespaces, diversify them with MMR and optionally rerank them before picking k
+    """
+
+    n_results = n_results or settings.retrieval_k
+    timings = {} if timings is None else timings
+    namespaces = resolve_namespaces(namespaces)
+
+    def retrieve_candidates(namespace: str):
+        start = time.perf_counter()
+        lexical_results = lexical_search(query, settings.hybrid_candidates, namespace, file_name)
+        lexical_ms = (time.perf_counter() - start) * 1000
+
+        vector_results, vector_ms = None, None
+        if query_embeddings is not None:
+            start = time.perf_counter()
+            vector_results = vector_search(
+                query_embeddings, settings.hybrid_candidates, file_name, include_embeddings=settings.mmr_enabled,
+                namespace=namespace
+            )
+            vector_ms = (time.perf_counter() - start) * 1000
+
+        return lexical_results, vector_results, lexical_ms, vector_ms
+
+    # Search every namespace in parallel, the slowest one decides the latency
+    candidates = fan_out(retrieve_candidates, namespaces)
+    timings["lexical_ms"] = max(lexical_ms for _, _, lexical_ms, _ in candidates)
+    if query_embeddings is not None:
+        timings["vector_ms"] = max(vector_ms for _, _, _, vector_ms in candidates)
+
+    # Merge the per-namespace candidates by score, BM25 scores are only approximately comparable across corpora
+    lexical_results = merge_by_score([lexical_results for lexical_results, _, _, _ in candidates],
+                                     settings.hybrid_candidates)
+    vector_results = None
+    if query_embeddings is not None:
+        vector_results = merge_by_score([vector_results for _, vector_results, _, _ in candidates],
+                                        settings.hybrid_candidates)
+
+    results = select_results(query, query_embeddings, vector_results, lexical_results, n_results, timings)
+
+    print("Retrieval timings: " + ", ".join(f"{stage} {value:.1f}" for stage, value in timings.items()))
+    return results
+
+
+def search_many(queries: list[str], query_embeddings_list: list, n_results=None, namespaces=None) -> list[list[dict]]:
+    """
+    Function to run hybrid retrieval for many queries with one vector lookup per namespace for all the embedded ones
+    """
+
+    n_results = n_results or settings.retrieval_k
+    namespaces = resolve_namespaces(namespaces)
+
+    # Queries whose embedding failed fall back to lexical retrieval
+    embedded = [index for index, embedding in enumerate(query_embeddings_list) if embedding is not None]
+
+    def retrieve_candidates(namespace: str):
+        lexical_results = [lexical_search(query, settings.hybrid_candidates, namespace) for query in queries]
+
+        vector_results = {}
+        if embedded:
+            result_lists = vector_search_many(
+                [query_embeddings_list[index] for index in embedded],
+                settings.hybrid_candidates,
+                include_embeddings=settings.mmr_enabled,
+                namespace=namespace
+            )
+            vector_results = dict(zip(embedded, result_lists))
+
+        return lexical_results, vector_results
+
+    candidates = fan_out(retrieve_candidates, namespaces)
+
+    results = []
+    for index, query in enumerate(queries):
+        lexical_results = merge_by_score([lexical[index] for lexical, _ in candidates], settings.hybrid_candidates)
+        vector_results = None
+        if index in candidates[0][1]:
+            vector_results = merge_by_score([vector[index] for _, vector in candidates], settings.hybrid_candidates)
+
+        results.append(select_results(query, query_embeddings_list[index], vector_results, lexical_results,
+                                      n_results, {}))
+
+    return results
+
+
+async def search_async(query: str, query_embeddings, n_results=None, timings=None, namespaces=None,
+                       file_name=None) -> list[dict]:
+    """
+    Function to run hybrid retrieval without blocking the event loop
+    """
+
+    return await asyncio.to_thread(search, query, query_embeddings, n_results, timings, namespaces, file_name)
+
+
+def build_generation_config(short: bool):
+    """
+    Function to build the Gemini generation config with the system instruction
     """
 
     # Define the system instruction for the Gemini model
@@ -46,20 +379,203 @@ def retrieve_and_generate(query: str, short: bool):
                Use simple language and shorter sentences.
         """
 
-    # Retrieve documents based on the query
-    documents = retrieve_documents(query)
+    return types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        thinking_config=types.ThinkingConfig(thinking_budget=10)
+    )
+
+
+def retrieve_and_generate(query: str, short: bool, namespaces=None, client=None):
+    """
+    Function to retrieve documents based on a query and generate a response using the Gemini model
+    """
+
+    # Retrieve documents based on the query and pack them into a labeled context
+    context = build_context(search(query, embed_query(query), namespaces=namespaces))
 
     # Generate a response using the Gemini model
-    response = gemini_client.models.generate_content_stream(
+    client = client or gemini_client
+    response = client.models.generate_content_stream(
         model="gemini-2.5-flash",
         contents=[
             f"Question: {query}.",
-            f"Retrieved Documents: {documents}.",
+            f"Retrieved Documents:\n{context}",
         ],
-        config=types.GenerateContentConfig(
-            system_instruction=system_instruction,
-            thinking_config=types.ThinkingConfig(thinking_budget=10)
-        )
+        config=build_generation_config(short)
     )
 
     return response
+
+
+async def retrieve_and_generate_async(query: str, short: bool, namespaces=None, client=None, file_name=None):
+    """
+    Function to retrieve documents from one or more namespaces, optionally within one document, and stream the generated response text using the async Gemini client
+    """
+
+    namespaces = resolve_namespaces(namespaces)
+    query_embeddings = await embed_query_async(query)
+
+    # Replay a cached answer for the same or a near-duplicate question over the same namespaces and document
+    if settings.answer_cache_enabled and query_embeddings is not None:
+        cached_chunks = answer_cache.lookup(query_embeddings, short, namespaces, file_name)
+        if cached_chunks is not None:
+            print(f"Answer cache hit for query: '{query}'")
+            for text in cached_chunks:
+                yield text
+            return
+
+    # Remember the knowledge base generation the answer is built from
+    generation = answer_cache.generation
+
+    # Retrieve documents based on the query, lexical only if the embedding is unavailable
+    results = await search_async(query, query_embeddings, namespaces=namespaces, file_name=file_name)
+    context = build_context(results)
+
+    # Generate a response using the async Gemini model
+    client = client or gemini_client
+    response = await client.aio.models.generate_content_stream(
+        model="gemini-2.5-flash",
+        contents=[
+            f"Question: {query}.",
+            f"Retrieved Documents:\n{context}",
+        ],
+        config=build_generation_config(short)
+    )
+
+    chunks = []
+    async for chunk in response:
+        if chunk.text:
+            chunks.append(chunk.text)
+            yield chunk.text
+
+    # Cache the complete answer
+    if settings.answer_cache_enabled and query_embeddings is not None:
+        answer_cache.store(query_embeddings, short, chunks, generation, namespaces, file_name)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Function to normalize the case and whitespace of a query so that identical questions share a key
+    """
+
+    return " ".join(query.lower().split())
+
+
+async def retrieve_and_generate_shared_async(query: str, short: bool, namespaces=None, file_name=None):
+    """
+    Function to stream an answer, sharing one embedding, retrieval and generation between concurrent identical queries
+    """
+
+    namespaces = resolve_namespaces(namespaces)
+    if not settings.query_coalescing_enabled:
+        async for text in retrieve_and_generate_async(query, short, namespaces, file_name=file_name):
+            yield text
+        return
+
+    key = (normalize_query(query), short, tuple(sorted(namespaces)), file_name)
+    factory = lambda: retrieve_and_generate_async(query, short, namespaces, file_name=file_name)
+    async for text in query_coalescer.subscribe(key, factory):
+        yield text
+
+
+async def generate_answer_async(query: str, results: list[dict], short: bool) -> str:
+    """
+    Function to generate a complete answer from retrieved chunks using the async Gemini client
+    """
+
+    context = build_context(results)
+
+    response = await gemini_client.aio.models.generate_content(
+        model="gemini-2.5-flash",
+        contents=[
+            f"Question: {query}.",
+            f"Retrieved Documents:\n{context}",
+        ],
+        config=build_generation_config(short)
+    )
+
+    return response.text or ""
+
+
+async def answer_batch(queries: list[str], short=False, max_concurrency=None, namespaces=None):
+    """
+    Function to answer many queries with batched embedding and retrieval, yielding the answers in completion order
+    """
+
+    namespaces = resolve_namespaces(namespaces)
+    max_concurrency = max_concurrency or settings.batch_generation_concurrency
+    semaphore = asyncio.Semaphore(max_concurrency)
+    completed = asyncio.Queue()
+    batch_start = time.perf_counter()
+    tasks = []
+
+    async def answer(index: int, query: str, query_embeddings, results: list[dict], timings: dict, generation: int):
+        record = {"index": index, "query": query, "sources": [chunk["metadata"]["file_name"] for chunk in results]}
+
+        try:
+            # Reuse a cached answer for the same or a near-duplicate question
+            cached_chunks = None
+            if settings.answer_cache_enabled and query_embeddings is not None:
+                cached_chunks = answer_cache.lookup(query_embeddings, short, namespaces)
+
+            start = time.perf_counter()
+            if cached_chunks is not None:
+                record["answer"] = "".join(cached_chunks)
+                record["cached"] = True
+            else:
+                async with semaphore:
+                    start = time.perf_counter()
+                    record["answer"] = await generate_answer_async(query, results, short)
+
+                if settings.answer_cache_enabled and query_embeddings is not None:
+                    answer_cache.store(query_embeddings, short, [record["answer"]], generation, namespaces)
+
+            timings["generation_ms"] = (time.perf_counter() - start) * 1000
+
+        except Exception as e:
+            print(f"Error during response generation for batch query {index}: {e}")
+            record["error"] = "An error occurred while generating the response"
+
+        timings["total_ms"] = (time.perf_counter() - batch_start) * 1000
+        record["timings"] = timings
+        await completed.put(record)
+
+    async def prepare():
+        # Embed and retrieve in provider-sized batches so generation starts before the whole set is retrieved
+        for offset in range(0, len(queries), settings.embedding_batch_size):
+            batch = queries[offset:offset + settings.embedding_batch_size]
+
+            start = time.perf_counter()
+            try:
+                embeddings = await asyncio.to_thread(generate_embeddings, batch)
+            except Exception as e:
+                print(f"Batch query embedding failed, falling back to lexical retrieval: {e}")
+                embeddings = [None] * len(batch)
+            embedding_ms = (time.perf_counter() - start) * 1000
+
+            generation = answer_cache.generation
+            start = time.perf_counter()
+            try:
+                result_lists = await asyncio.to_thread(search_many, batch, embeddings, None, namespaces)
+            except Exception as e:
+                print(f"Batch retrieval failed: {e}")
+                for index, query in enumerate(batch, start=offset):
+                    await completed.put({"index": index, "query": query, "error": "An error occurred during retrieval"})
+                continue
+            retrieval_ms = (time.perf_counter() - start) * 1000
+
+            for index, (query, query_embeddings, results) in enumerate(zip(batch, embeddings, result_lists), start=offset):
+                timings = {"batch_embedding_ms": embedding_ms, "batch_retrieval_ms": retrieval_ms}
+                tasks.append(asyncio.create_task(answer(index, query, query_embeddings, results, timings, generation)))
+
+    preparer = asyncio.create_task(prepare())
+
+    try:
+        for _ in range(len(queries)):
+            yield await completed.get()
+
+    finally:
+        # Stop the remaining work when the client goes away
+        preparer.cancel()
+        for task in tasks:
+            task.cancel()
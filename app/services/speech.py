@@ -1,23 +1,52 @@
 # Import necessary libraries
+from concurrent.futures import ThreadPoolExecutor
 from app.clients.groq_client import groq_client
+from app.services.audio_cache import audio_cache
+from app.services.audio_preprocessing import preprocess_audio
 from fastapi import HTTPException
+from config import settings
+
+# Groq text-to-speech model and voice
+TTS_MODEL = "playai-tts"
+TTS_VOICE = "Arista-PlayAI"
+
+
+def transcribe(audio_bytes: bytes) -> str:
+    """
+    Function to transcribe one audio file using Groq's Whisper model
+    """
+
+    transcription = groq_client.audio.transcriptions.create(
+        file=("audio.wav", audio_bytes),
+        model="whisper-large-v3-turbo",
+        prompt="Please transcribe the provided audio file. The speaker has an Indian English accent.",
+        response_format="verbose_json",
+        language="en"
+    )
+
+    return transcription.text
 
 
 def speech_to_text(audio_bytes: bytes) -> str:
     """
-    Function to convert speech to text using Groq's Whisper model
+    Function to convert speech to text using Groq's Whisper model, uploading compact speech-only segments
     """
 
     try:
-        transcription = groq_client.audio.transcriptions.create(
-            file=("audio.wav", audio_bytes),
-            model="whisper-large-v3-turbo",
-            prompt="Please transcribe the provided audio file. The speaker has an Indian English accent.",
-            response_format="verbose_json",
-            language="en"
-        )
+        # Send the audio as is when it cannot be decoded locally
+        segments = preprocess_audio(audio_bytes) if settings.stt_preprocess_enabled else None
+        if segments is None:
+            return transcribe(audio_bytes)
+
+        print(f"Audio preprocessed from {len(audio_bytes)} to {sum(map(len, segments))} bytes "
+              f"in {len(segments)} segments")
 
-        return transcription.text
+        if len(segments) <= 1:
+            return transcribe(segments[0]) if segments else ""
+
+        # Transcribe long inputs in parallel, map() keeps the segment order
+        with ThreadPoolExecutor(max_workers=min(settings.stt_max_workers, len(segments))) as executor:
+            return " ".join(text.strip() for text in executor.map(transcribe, segments))
 
     except Exception as e:
         print(f"Error during speech-to-text conversion: {e}")
@@ -36,8 +65,8 @@ def text_to_speech(text: str) -> bytes:
     try:
         audio = groq_client.audio.speech.create(
             input=text,
-            model="playai-tts",
-            voice="Arista-PlayAI",
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
             response_format="wav",
         )
 
@@ -50,3 +79,25 @@ def text_to_speech(text: str) -> bytes:
             status_code=500,
             detail="An error occurred during text-to-speech conversion"
         )
+
+
+def speech_cache_key(text: str) -> str:
+    """
+    Function to return the audio cache key of a text for the configured TTS model and voice
+    """
+
+    return audio_cache.make_key(text, TTS_MODEL, TTS_VOICE)
+
+
+def cached_text_to_speech(text: str) -> tuple[str, str]:
+    """
+    Function to return the cache key and audio file of a text, synthesizing it only on a cache miss
+    """
+
+    key = speech_cache_key(text)
+
+    path = audio_cache.get_path(key)
+    if path is None:
+        path = audio_cache.put(key, text_to_speech(text))
+
+    return key, path
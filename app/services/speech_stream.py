@@ -0,0 +1,141 @@
+# Import necessary libraries
+import io
+import re
+import wave
+import struct
+import asyncio
+from typing import AsyncIterator
+from app.services.speech import cached_text_to_speech
+from config import settings
+
+# Sentence ends followed by whitespace, the text after the last one is kept for the next chunk
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Size placeholder used by streamed WAV files whose length is not known up front
+STREAMING_SIZE = 0xFFFFFFFF
+
+
+async def iter_sentences(text_stream: AsyncIterator[str], min_chars=None) -> AsyncIterator[str]:
+    """
+    Function to segment a stream of generated text into sentences as soon as each one is complete
+    """
+
+    min_chars = min_chars or settings.tts_min_sentence_chars
+    buffer = ""
+
+    async for text in text_stream:
+        buffer += text
+        parts = SENTENCE_END.split(buffer)
+        buffer = parts.pop()
+
+        # Join very short sentences with the next one to save synthesis calls
+        pending = ""
+        for sentence in parts:
+            pending = f"{pending} {sentence}".strip()
+            if len(pending) >= min_chars:
+                yield pending
+                pending = ""
+        # Keep the whitespace after the carried text, the next chunk may start without a space
+        buffer = f"{pending} {buffer.lstrip()}" if pending else buffer
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def decode_wav(audio_bytes: bytes) -> tuple[tuple[int, int, int], bytes]:
+    """
+    Function to split a WAV file into its (channels, sample width, frame rate) format and raw PCM frames
+    """
+
+    with wave.open(io.BytesIO(audio_bytes), 'rb') as wav_file:
+        audio_format = (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate())
+        return audio_format, wav_file.readframes(wav_file.getnframes())
+
+
+def streaming_wav_header(channels: int, sample_width: int, frame_rate: int) -> bytes:
+    """
+    Function to build a PCM WAV header with unknown length for a stream of frames
+    """
+
+    return (
+        b"RIFF" + struct.pack("<I", STREAMING_SIZE) + b"WAVE"
+        + b"fmt " + struct.pack(
+            "<IHHIIHH", 16, 1, channels, frame_rate,
+            frame_rate * channels * sample_width, channels * sample_width, sample_width * 8
+        )
+        + b"data" + struct.pack("<I", STREAMING_SIZE)
+    )
+
+
+def synthesize_sentence(sentence: str):
+    """
+    Function to synthesize one sentence, or load it from the audio cache, and decode it to PCM frames
+    """
+
+    _, path = cached_text_to_speech(sentence)
+    with open(path, 'rb') as buffer:
+        return decode_wav(buffer.read())
+
+
+async def stream_speech(text_stream: AsyncIterator[str], max_concurrency=None) -> AsyncIterator[bytes]:
+    """
+    Function to synthesize sentences concurrently as they are generated and stream one WAV with the frames in order
+    """
+
+    max_concurrency = max_concurrency or settings.tts_max_concurrency
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Synthesis tasks in sentence order, bounded so generation does not run far ahead of playback
+    tasks = asyncio.Queue(maxsize=max_concurrency * 2)
+
+    async def synthesize(sentence: str):
+        async with semaphore:
+            return await asyncio.to_thread(synthesize_sentence, sentence)
+
+    async def produce():
+        try:
+            async for sentence in iter_sentences(text_stream):
+                await tasks.put(asyncio.create_task(synthesize(sentence)))
+        except Exception as e:
+            print(f"Sentence segmentation stopped early: {e}")
+
+        # Mark the end of the sentences
+        await tasks.put(None)
+
+    producer = asyncio.create_task(produce())
+    task = None
+    header_format = None
+
+    try:
+        while True:
+            task = await tasks.get()
+            if task is None:
+                break
+
+            try:
+                audio_format, frames = await task
+            except Exception as e:
+                print(f"Skipping a sentence that failed to synthesize: {e}")
+                continue
+
+            # The first sentence decides the format of the whole stream
+            if header_format is None:
+                header_format = audio_format
+                yield streaming_wav_header(*audio_format)
+            elif audio_format != header_format:
+                print(f"Skipping a sentence synthesized as {audio_format} instead of {header_format}")
+                continue
+
+            yield frames
+
+        await producer
+
+    finally:
+        # Stop generating and synthesizing when the client goes away
+        producer.cancel()
+        if task is not None:
+            task.cancel()
+        while not tasks.empty():
+            queued = tasks.get_nowait()
+            if queued is not None:
+                queued.cancel()
@@ -0,0 +1,390 @@
+# Import necessary libraries
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import numpy as np
+from config import settings
+
+# The mirror only beats the HNSW index for unfiltered search up to about 10000 chunks (vector_mirror_max_chunks),
+# so it does not serve corpora of tens of thousands of chunks, which fall back to ChromaDB except for searches
+# within one document. Each namespace keeps a float32 copy in RAM sized to the doubled capacity, up to
+# 8 * dimension bytes per chunk, e.g. about 60 MB for 10000 chunks of 768 dimensions.
+
+class VectorMirror:
+    """
+    An in-process mirror of the chunk embeddings for exact search, stored as float16 on disk and scored in float32 in RAM
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the mirror and load the matrix and ids saved in the directory
+        """
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+
+        self.dimension = None
+        self.backend = None
+        self.vectors = None
+        self.working = None
+        self.ids = []
+        self.file_names = []
+        self.positions = {}
+        self.file_name_array = None
+
+        if os.path.exists(self.index_path) and os.path.exists(self.vectors_path):
+            with open(self.index_path, 'r') as buffer:
+                index = json.load(buffer)
+
+            self.dimension = index["dimension"]
+            self.backend = index.get("backend")
+            self.ids = index["ids"]
+            self.file_names = index["file_names"]
+            self.positions = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r+").reshape(-1, self.dimension)
+
+            # Upcast once on load so that queries run a single float32 matrix product
+            self.working = np.zeros(self.vectors.shape, dtype=np.float32)
+            self.working[:self.size] = self.vectors[:self.size]
+
+    @property
+    def size(self) -> int:
+        """
+        Property with the number of chunks in the mirror
+        """
+
+        return len(self.ids)
+
+    def save(self):
+        """
+        Method to flush the matrix and atomically save the ids, must be called with the lock held
+        """
+
+        if self.vectors is not None:
+            self.vectors.flush()
+
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as buffer:
+            json.dump(
+                {"dimension": self.dimension, "backend": self.backend, "ids": self.ids, "file_names": self.file_names},
+                buffer
+            )
+        os.replace(temp_path, self.index_path)
+
+        self.file_name_array = None
+
+    def reserve(self, rows: int):
+        """
+        Method to grow the memory-mapped matrix to hold at least the given rows, must be called with the lock held
+        """
+
+        capacity = len(self.vectors) if self.vectors is not None else 0
+        if rows <= capacity:
+            return
+
+        # Double the capacity so appends stay amortized constant time
+        new_capacity = max(rows, capacity * 2, 1024)
+        temp_path = f"{self.vectors_path}.tmp"
+        vectors = np.memmap(temp_path, dtype=np.float16, mode="w+", shape=(new_capacity, self.dimension))
+        if capacity:
+            vectors[:self.size] = self.vectors[:self.size]
+        vectors.flush()
+        del vectors
+
+        self.vectors = None
+        os.replace(temp_path, self.vectors_path)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r+").reshape(-1, self.dimension)
+
+        working = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        if capacity:
+            working[:self.size] = self.working[:self.size]
+        self.working = working
+
+    def upsert(self, ids: list[str], embeddings, metadatas: list[dict], backend=None):
+        """
+        Method to add or replace L2-normalized chunk embeddings in the mirror, recording the backend that produced them
+        """
+
+        if not ids:
+            return
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.where(norms == 0, 1, norms)).astype(np.float16)
+
+        with self.lock:
+            if self.dimension is None:
+                self.dimension = matrix.shape[1]
+            elif matrix.shape[1] != self.dimension:
+                raise ValueError(f"The vector mirror stores {self.dimension}-dimensional vectors, got {matrix.shape[1]}")
+
+            if self.backend is None:
+                self.backend = backend
+
+            self.reserve(self.size + len(ids))
+
+            for chunk_id, vector, metadata in zip(ids, matrix, metadatas):
+                row = self.positions.get(chunk_id)
+                if row is None:
+                    row = self.size
+                    self.positions[chunk_id] = row
+                    self.ids.append(chunk_id)
+                    self.file_names.append(metadata["file_name"])
+                else:
+                    self.file_names[row] = metadata["file_name"]
+
+                self.vectors[row] = vector
+                self.working[row] = vector
+
+            self.save()
+
+    def delete_rows(self, rows: list[int]):
+        """
+        Method to delete rows by moving the last rows into their place, must be called with the lock held
+        """
+
+        # Delete from the bottom up so moved rows are never deleted rows
+        for row in sorted(rows, reverse=True):
+            last = self.size - 1
+            del self.positions[self.ids[row]]
+
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.working[row] = self.working[last]
+                self.ids[row] = self.ids[last]
+                self.file_names[row] = self.file_names[last]
+                self.positions[self.ids[row]] = row
+
+            self.ids.pop()
+            self.file_names.pop()
+
+    def delete(self, ids: list[str]):
+        """
+        Method to delete chunks from the mirror by id
+        """
+
+        with self.lock:
+            rows = [self.positions[chunk_id] for chunk_id in ids if chunk_id in self.positions]
+            if rows:
+                self.delete_rows(rows)
+                self.save()
+
+    def delete_file(self, file_name: str):
+        """
+        Method to delete all the chunks of a document from the mirror
+        """
+
+        with self.lock:
+            rows = [row for row, name in enumerate(self.file_names) if name == file_name]
+            if rows:
+                self.delete_rows(rows)
+                self.save()
+
+    def clear(self):
+        """
+        Method to remove every chunk and the stored matrix
+        """
+
+        with self.lock:
+            self.vectors = None
+            self.working = None
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+
+            self.dimension = None
+            self.backend = None
+            self.ids = []
+            self.file_names = []
+            self.positions = {}
+            self.save()
+
+    def get_vectors(self, ids: list[str]) -> dict:
+        """
+        Method to get the stored normalized vectors of chunks by id
+        """
+
+        with self.lock:
+            return {
+                chunk_id: self.working[self.positions[chunk_id]].copy()
+                for chunk_id in ids if chunk_id in self.positions
+            }
+
+    def search_many(self, query_embeddings, n_results: int) -> list[list[tuple[str, float]]]:
+        """
+        Method to return the ids and cosine scores of the nearest chunks for many queries in one pass over the matrix
+        """
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        with self.lock:
+            if self.size == 0:
+                return [[] for _ in queries]
+            if queries.shape[1] != self.dimension:
+                raise ValueError(
+                    f"The vector mirror stores {self.dimension}-dimensional vectors, got {queries.shape[1]}"
+                )
+
+            # Score every query against the float32 working copy in one matrix product
+            scores = queries @ self.working[:self.size].T
+
+            # Select the top rows of each query without sorting the whole score matrix
+            k = min(n_results, self.size)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+            results = []
+            for query_scores, query_top in zip(scores, top):
+                query_top = query_top[np.argsort(-query_scores[query_top])]
+                results.append([(self.ids[i], float(query_scores[i])) for i in query_top])
+
+            return results
+
+    def search(self, query_embedding, n_results: int, file_name=None) -> list[tuple[str, float]]:
+        """
+        Method to return the ids and cosine scores of the nearest chunks to a query, optionally within one document
+        """
+
+        if file_name is None:
+            return self.search_many([query_embedding], n_results)[0]
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        with self.lock:
+            if self.size == 0:
+                return []
+            if len(query) != self.dimension:
+                raise ValueError(f"The vector mirror stores {self.dimension}-dimensional vectors, got {len(query)}")
+
+            # Only score the rows of the requested document
+            if self.file_name_array is None:
+                self.file_name_array = np.asarray(self.file_names, dtype=object)
+            rows = np.flatnonzero(self.file_name_array == file_name)
+            if len(rows) == 0:
+                return []
+            scores = self.working[rows] @ query
+
+            # Select the top rows without sorting the whole score vector
+            k = min(n_results, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+
+# Create the vector mirror instance
+vector_mirror = VectorMirror(settings.vector_mirror_path)
+
+# Vector mirrors of the namespaces, each in its own directory next to the default one
+vector_mirrors = {settings.default_namespace: vector_mirror}
+vector_mirrors_lock = threading.Lock()
+
+
+def namespace_mirror_path(namespace: str) -> str:
+    """
+    Function to build the directory of the vector mirror of a namespace
+    """
+
+    if namespace == settings.default_namespace:
+        return settings.vector_mirror_path
+
+    return f"{os.path.normpath(settings.vector_mirror_path)}.{namespace}"
+
+
+def get_vector_mirror(namespace=None) -> VectorMirror:
+    """
+    Function to get or create the vector mirror of a namespace
+    """
+
+    namespace = namespace or settings.default_namespace
+
+    with vector_mirrors_lock:
+        if namespace not in vector_mirrors:
+            vector_mirrors[namespace] = VectorMirror(namespace_mirror_path(namespace))
+
+        return vector_mirrors[namespace]
+
+
+def drop_vector_mirror(namespace: str):
+    """
+    Function to clear and remove the directory of the vector mirror of a namespace
+    """
+
+    with vector_mirrors_lock:
+        mirror = vector_mirrors.pop(namespace, None)
+
+    if mirror is not None:
+        mirror.clear()
+
+    shutil.rmtree(namespace_mirror_path(namespace), ignore_errors=True)
+
+
+def run_benchmark(n_chunks=20000, dimension=768, n_queries=200, n_results=10):
+    """
+    Function to compare top-k latency of the mirror and an in-memory Chroma collection on random vectors
+    """
+
+    import chromadb
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n_chunks, dimension), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    ids = [f"chunk_{i}" for i in range(n_chunks)]
+    metadatas = [{"file_name": f"file_{i % 100}.txt"} for i in range(n_chunks)]
+    queries = embeddings[rng.choice(n_chunks, n_queries, replace=False)] + 0.1 * rng.standard_normal(
+        (n_queries, dimension), dtype=np.float32
+    )
+
+    directory = tempfile.mkdtemp()
+    try:
+        mirror = VectorMirror(directory)
+        for i in range(0, n_chunks, 1000):
+            mirror.upsert(ids[i:i + 1000], embeddings[i:i + 1000], metadatas[i:i + 1000])
+
+        chroma_collection = chromadb.EphemeralClient().get_or_create_collection(name="benchmark")
+        for i in range(0, n_chunks, 1000):
+            chroma_collection.add(ids=ids[i:i + 1000], embeddings=embeddings[i:i + 1000], metadatas=metadatas[i:i + 1000])
+
+        timings = {"mirror": [], "mirror_filtered": [], "chroma": [], "chroma_filtered": []}
+        recalls = []
+        for query in queries:
+            start = time.perf_counter()
+            mirror_ids = [chunk_id for chunk_id, _ in mirror.search(query, n_results)]
+            timings["mirror"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            mirror.search(query, n_results, file_name="file_7.txt")
+            timings["mirror_filtered"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            chroma_ids = chroma_collection.query(query_embeddings=[query], n_results=n_results)["ids"][0]
+            timings["chroma"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            chroma_collection.query(query_embeddings=[query], n_results=n_results, where={"file_name": "file_7.txt"})
+            timings["chroma_filtered"].append(time.perf_counter() - start)
+
+            recalls.append(len(set(mirror_ids) & set(chroma_ids)) / n_results)
+
+        print(f"{n_chunks} chunks, {dimension} dims, {n_queries} queries, top {n_results}")
+        for name, values in timings.items():
+            values = np.asarray(values) * 1000
+            print(f"{name:>16}: p50 {np.percentile(values, 50):7.2f} ms, p95 {np.percentile(values, 95):7.2f} ms")
+        print(f"Overlap of mirror and Chroma results: {np.mean(recalls):.3f}")
+        print(f"Mirror matrix size: {os.path.getsize(mirror.vectors_path) / 1024 / 1024:.1f} MB")
+
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,82 @@
+# Import necessary libraries
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from types import SimpleNamespace
+from app.services.embedding import generate_embeddings
+from app.services.embedding_backends import GeminiBackend
+from app.services.embedding_cache import EmbeddingCache
+from config import settings
+
+
+class FakeEmbeddingClient:
+    """
+    A fake Gemini client whose embed calls sleep for a fixed round trip plus a small cost per item
+    """
+
+    def __init__(self, call_seconds: float, item_seconds: float):
+        """
+        Initialize the simulated latencies
+        """
+
+        self.call_seconds = call_seconds
+        self.item_seconds = item_seconds
+        self.models = SimpleNamespace(embed_content=self.embed_content)
+
+    def embed_content(self, model, contents, config=None):
+        """
+        Method to return zero vectors after the simulated latency
+        """
+
+        contents = contents if isinstance(contents, list) else [contents]
+        time.sleep(self.call_seconds + self.item_seconds * len(contents))
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[0.0] * 8) for _ in contents])
+
+
+def run_benchmark(n_contents=1000, call_seconds=0.2, item_seconds=0.002, batch_size=None, max_workers=None):
+    """
+    Function to compare the throughput of serial, batched and concurrent batched embedding with a fake Gemini client
+    """
+
+    batch_size = batch_size or settings.embedding_batch_size
+    max_workers = max_workers or settings.embedding_max_workers
+    backend = GeminiBackend("fake-embedding", client=FakeEmbeddingClient(call_seconds, item_seconds))
+    contents = [f"chunk {i} of the benchmark" for i in range(n_contents)]
+
+    runs = {
+        "serial, one per call": (1, 1),
+        f"batched by {batch_size}, 1 worker": (batch_size, 1),
+        f"batched by {batch_size}, {max_workers} workers": (batch_size, max_workers)
+    }
+
+    # Use a throwaway cache per run so that every run embeds every content
+    directory = tempfile.mkdtemp()
+    try:
+        for run, (run_batch_size, run_workers) in runs.items():
+            cache = EmbeddingCache(os.path.join(directory, f"{run_batch_size}_{run_workers}.sqlite3"), n_contents)
+
+            # The serial run would take minutes at full size, so it is measured on a sample and extrapolated
+            sample = contents if run_batch_size > 1 else contents[:max(n_contents // 20, 1)]
+
+            start = time.perf_counter()
+            generate_embeddings(sample, run_batch_size, run_workers, backend=backend, cache=cache)
+            elapsed = (time.perf_counter() - start) * len(contents) / len(sample)
+
+            print(f"{run:>28}: {elapsed:7.2f}s for {n_contents} contents, {n_contents / elapsed:8.1f} contents/s")
+
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare serial and batched embedding throughput")
+    parser.add_argument("--contents", type=int, default=1000)
+    parser.add_argument("--call-seconds", type=float, default=0.2)
+    parser.add_argument("--item-seconds", type=float, default=0.002)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    run_benchmark(args.contents, args.call_seconds, args.item_seconds, args.batch_size, args.workers)
@@ -0,0 +1,122 @@
+# Import necessary libraries
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+from types import SimpleNamespace
+
+# Run against empty throwaway stores with the offline embedding backend and without the answer cache
+STATE_DIRECTORY = tempfile.mkdtemp()
+os.environ.update({
+    "EMBEDDING_BACKEND": "stub",
+    "ANSWER_CACHE_ENABLED": "false",
+    "CHROMA_DB_PATH": os.path.join(STATE_DIRECTORY, "chroma_db"),
+    "EMBEDDING_CACHE_PATH": os.path.join(STATE_DIRECTORY, "embeddings.sqlite3"),
+    "LEXICAL_INDEX_PATH": os.path.join(STATE_DIRECTORY, "lexical_index.sqlite3"),
+    "VECTOR_MIRROR_PATH": os.path.join(STATE_DIRECTORY, "vector_mirror")
+})
+
+from starlette.concurrency import iterate_in_threadpool
+from app.services.retriever import retrieve_and_generate, retrieve_and_generate_async
+
+
+class FakeGeminiClient:
+    """
+    A fake Gemini client whose streams wait for the first token, then yield tokens at a fixed rate
+    """
+
+    def __init__(self, first_token_seconds: float, token_count: int, token_seconds: float):
+        """
+        Initialize the simulated latencies and the sync and async model interfaces
+        """
+
+        self.first_token_seconds = first_token_seconds
+        self.token_count = token_count
+        self.token_seconds = token_seconds
+        self.models = SimpleNamespace(generate_content_stream=self.generate_content_stream)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self.generate_content_stream_async))
+
+    def generate_content_stream(self, **kwargs):
+        """
+        Method to stream the fake tokens, blocking the calling thread while waiting
+        """
+
+        time.sleep(self.first_token_seconds)
+        for i in range(self.token_count):
+            if i:
+                time.sleep(self.token_seconds)
+            yield SimpleNamespace(text=f"token {i} ")
+
+    async def stream_async(self):
+        """
+        Method to stream the fake tokens without blocking the event loop
+        """
+
+        await asyncio.sleep(self.first_token_seconds)
+        for i in range(self.token_count):
+            if i:
+                await asyncio.sleep(self.token_seconds)
+            yield SimpleNamespace(text=f"token {i} ")
+
+    async def generate_content_stream_async(self, **kwargs):
+        """
+        Method to start a fake stream like the async Gemini client does
+        """
+
+        return self.stream_async()
+
+
+async def first_byte(body) -> float:
+    """
+    Function to time a streamed body until its first chunk, then drain the rest like a streaming client would
+    """
+
+    start = time.perf_counter()
+    elapsed = None
+    async for _ in body:
+        if elapsed is None:
+            elapsed = time.perf_counter() - start
+
+    return elapsed
+
+
+async def run_benchmark(n_queries=64, first_token_seconds=0.3, token_count=10, token_seconds=0.02):
+    """
+    Function to compare the p50/p99 time-to-first-byte of the sync and async query paths with a fake Gemini client
+    """
+
+    client = FakeGeminiClient(first_token_seconds, token_count, token_seconds)
+
+    def sync_body(query: str):
+        for chunk in retrieve_and_generate(query, False, client=client):
+            yield chunk.text
+
+    # The sync path streams a sync generator, which StreamingResponse iterates in the threadpool
+    sync_times = await asyncio.gather(*[
+        first_byte(iterate_in_threadpool(sync_body(f"question {i}"))) for i in range(n_queries)
+    ])
+    async_times = await asyncio.gather(*[
+        first_byte(retrieve_and_generate_async(f"question {i}", False, client=client)) for i in range(n_queries)
+    ])
+
+    print(f"{n_queries} concurrent queries, fake first token after {first_token_seconds * 1000:.0f} ms")
+    for name, times in (("sync", sync_times), ("async", async_times)):
+        times = np.asarray(times) * 1000
+        print(f"{name:>5}: TTFB p50 {np.percentile(times, 50):7.1f} ms, p99 {np.percentile(times, 99):7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the time-to-first-byte of the sync and async query paths")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--first-token-seconds", type=float, default=0.3)
+    parser.add_argument("--tokens", type=int, default=10)
+    parser.add_argument("--token-seconds", type=float, default=0.02)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_benchmark(args.queries, args.first_token_seconds, args.tokens, args.token_seconds))
+    finally:
+        shutil.rmtree(STATE_DIRECTORY)
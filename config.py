@@ -8,6 +8,64 @@ class Settings(BaseSettings):
     groq_api_key: str
     chroma_db_path: str = "./chroma_db"
     data_directory_path: str = "./data"
+    embedding_backend: str = "gemini"
+    gemini_embedding_model: str = "gemini-embedding-001"
+    local_embedding_model: str = "Qwen/Qwen3-Embedding-0.6B"
+    local_embedding_quantize: bool = False
+    stub_embedding_dimension: int = 256
+    embedding_dimension: int | None = None
+    chroma_collection_name: str = "document_embeddings"
+    default_namespace: str = "default"
+    namespace_fanout_workers: int = 8
+    embedding_batch_size: int = 100
+    embedding_max_workers: int = 4
+    embedding_cache_path: str = "./cache/embeddings.sqlite3"
+    embedding_cache_max_entries: int = 200000
+    jobs_db_path: str = "./state/jobs.sqlite3"
+    ingestion_workers: int = 2
+    answer_cache_enabled: bool = True
+    answer_cache_similarity_threshold: float = 0.95
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_max_entries: int = 1000
+    lexical_max_df_ratio: float = 0.5
+    lexical_max_df_min_chunks: int = 1000
+    lexical_index_path: str = "./state/lexical_index.sqlite3"
+    embedding_timeout_seconds: float = 5.0
+    hybrid_candidates: int = 20
+    retrieval_k: int = 3
+    mmr_enabled: bool = True
+    mmr_lambda: float = 0.7
+    reranker_enabled: bool = False
+    reranker_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    reranker_candidates: int = 8
+    context_token_budget: int = 2000
+    rrf_k: int = 60
+    crawl_batch_pages: int = 20
+    crawl_max_concurrent: int = 2
+    crawl_max_pages: int = 500
+    crawl_max_seconds: int = 1800
+    crawl_state_path: str = "./state/crawl_state.sqlite3"
+    crawl_drop_boilerplate: bool = False
+    catalog_db_path: str = "./state/catalog.sqlite3"
+    upload_chunk_size: int = 1024 * 1024
+    max_upload_size: int = 200 * 1024 * 1024
+    pdf_pages_per_task: int = 25
+    pdf_max_workers: int | None = None
+    vector_mirror_enabled: bool = False
+    vector_mirror_path: str = "./state/vector_mirror"
+    # Unfiltered search uses the mirror only below this size, larger corpora go to ChromaDB
+    vector_mirror_max_chunks: int = 10000
+    tts_max_concurrency: int = 3
+    tts_min_sentence_chars: int = 40
+    audio_cache_path: str = "./cache/audio"
+    audio_cache_max_bytes: int = 500 * 1024 * 1024
+    stt_preprocess_enabled: bool = True
+    stt_sample_rate: int = 16000
+    stt_max_segment_seconds: int = 30
+    stt_max_workers: int = 4
+    batch_max_queries: int = 5000
+    batch_generation_concurrency: int = 8
+    query_coalescing_enabled: bool = True
     model_config = SettingsConfigDict(env_file=".env")
 
 # Create an instance of Settings
@@ -1,20 +1,89 @@
 # Import necessary libraries
 import os
 import json
+import asyncio
+import hashlib
+import tempfile
 from config import settings
 from datetime import datetime
-from typing import Generator
+from typing import AsyncGenerator, Literal
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from fastapi import FastAPI, UploadFile, HTTPException, status, BackgroundTasks
-from fastapi.responses import Response, StreamingResponse
+from fastapi import FastAPI, UploadFile, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse, FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.services.indexer import add_document, delete_document
-from app.services.retriever import retrieve_and_generate
-from app.services.speech import speech_to_text, text_to_speech
-from app.services.crawler import run_scrapy_crawler
+from app.clients.chromadb_client import get_collection, list_namespaces, validate_namespace
+from app.services.indexer import (
+    delete_document, drop_namespace, backfill_lexical_index, check_collection_backend, sync_vector_mirror
+)
+from app.services.jobs import job_queue
+from app.services.retriever import retrieve_and_generate_shared_async, answer_batch
+from app.services.speech import speech_to_text, cached_text_to_speech, speech_cache_key
+from app.services.embedding_cache import embedding_cache
+from app.services.answer_cache import answer_cache
+from app.services.audio_cache import audio_cache
+from app.services.coalescing import query_coalescer
+from app.services.speech_stream import stream_speech
+from app.services.crawl_manager import crawl_manager
+from app.services.catalog import catalog
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Function to start and stop the background services with the application
+    """
+
+    for namespace in list_namespaces():
+        # Refuse to start if a collection was built with another embedding backend
+        check_collection_backend(namespace=namespace)
+
+        # Build the lexical index for collections indexed before it existed
+        backfill_lexical_index(namespace=namespace)
+
+        # Rebuild the in-process vector mirror if it is out of sync with the collection
+        sync_vector_mirror(namespace=namespace)
+
+    # Import the JSON metadata files of documents added before the catalog existed
+    if catalog.count() == 0:
+        catalog.import_sidecars(settings.data_directory_path)
+
+    # Start the ingestion workers and the crawl manager and resume their unfinished work
+    job_queue.start()
+    crawl_manager.start()
+    yield
+    crawl_manager.stop()
+    job_queue.stop()
+
 
 # Create FastAPI application instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Room for the multipart boundaries and part headers around an uploaded file
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Middleware to reject oversized uploads from their Content-Length, before the form is spooled to disk
+    """
+
+    if request.method == "POST" and request.url.path == "/api/documents":
+        content_length = request.headers.get("content-length")
+        if content_length is None or not content_length.isdigit():
+            return JSONResponse(
+                status_code=status.HTTP_411_LENGTH_REQUIRED,
+                content={"detail": "Uploads must send a Content-Length header"}
+            )
+
+        if int(content_length) > settings.max_upload_size + UPLOAD_FORM_OVERHEAD:
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": f"File too large. The maximum upload size is {settings.max_upload_size} bytes"}
+            )
+
+    return await call_next(request)
+
 
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
@@ -28,21 +97,64 @@ app.add_middleware(
 # Pydantic model for text queries
 class UploadUrl(BaseModel):
     url: str
+    max_pages: int | None = None
+    max_seconds: int | None = None
+    recrawl: bool = False
+    namespace: str | None = None
+
+class BatchQuery(BaseModel):
+    queries: list[str]
+    short: bool = False
+    namespaces: list[str] | None = None
 
 class DeleteDocument(BaseModel):
     file_name: str
 
 class TextQuery(BaseModel):
     query: str
+    namespaces: list[str] | None = None
+    file_name: str | None = None
+
+def check_namespace(namespace: str | None) -> str:
+    """
+    Function to reject an invalid namespace name in a request
+    """
+
+    try:
+        return validate_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
-def stream_generator(query: str, short: bool) -> Generator[str, None, None]:
+def check_namespaces(namespaces: list[str] | None) -> list[str] | None:
     """
-    Function to generate a stream of responses from the RAG model
+    Function to reject invalid or unknown namespaces in a query
+    """
+
+    if not namespaces:
+        return None
+
+    namespaces = [check_namespace(namespace) for namespace in namespaces]
+    unknown = sorted(set(namespaces) - set(list_namespaces()))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown namespaces: {', '.join(unknown)}"
+        )
+
+    return namespaces
+
+async def stream_generator(query: str, short: bool, namespaces=None, file_name=None) -> AsyncGenerator[str, None]:
+    """
+    Function to generate a stream of responses from the RAG model, optionally restricted to one document
     """
 
     try:
-        for chunk in retrieve_and_generate(query, short):
-            yield chunk.text
+        # Concurrent identical queries share one upstream generation
+        async for text in retrieve_and_generate_shared_async(query, short, namespaces, file_name):
+            yield text
     except Exception as e:
         print(f"Error during response generation: {e}")
         yield "An error occurred while generating the response"
@@ -52,29 +164,31 @@ def stream_generator(query: str, short: bool) -> Generator[str, None, None]:
     "/api/documents",
     status_code=status.HTTP_200_OK
 )
-async def list_documents_endpoint():
+async def list_documents_endpoint(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    sort: Literal["date", "size", "name", "file_name"] = "date",
+    order: Literal["asc", "desc"] = "desc",
+    extension: str | None = None,
+    source: Literal["upload", "crawl"] | None = None,
+    search: str | None = None,
+    namespace: str | None = None,
+    view: Literal["summary", "full"] = "summary"
+):
     """
     API endpoint to list all documents in the knowledge base
     """
 
     try:
-        # List all the files in the knowledge base
-        os.makedirs(settings.data_directory_path, exist_ok=True)
-        files = os.listdir(settings.data_directory_path)
-
-        documents = []
-        for file_name in files:
-            if file_name.endswith('.json'):
-                # Load metadata from the JSON file
-                json_path = os.path.join(settings.data_directory_path, file_name)
-                with open(json_path, 'r') as buffer:
-                    metadata = json.load(buffer)
-                    documents.append(metadata)
+        # List a page of documents from the catalog, the summary view omits the crawled URLs
+        listing = catalog.list_documents(
+            page, page_size, sort, order, extension, source, search, view == "full", namespace
+        )
 
         return {
             'status': 'success',
             'message': 'Documents listed successfully',
-            'documents': documents
+            **listing
         }
 
     except Exception as e:
@@ -88,13 +202,15 @@ async def list_documents_endpoint():
 
 @app.post(
     "/api/documents",
-    status_code=status.HTTP_201_CREATED
+    status_code=status.HTTP_202_ACCEPTED
 )
-async def upload_document_endpoint(file: UploadFile):
+async def upload_document_endpoint(file: UploadFile, response: Response, namespace: str | None = None):
     """
-    API endpoint to upload a document for indexing for RAG knowledge base
+    API endpoint to upload a document for indexing into a namespace of the RAG knowledge base
     """
 
+    namespace = check_namespace(namespace)
+
     file_name = os.path.splitext(file.filename)[0]
     file_extension = os.path.splitext(file.filename)[1].lower()
 
@@ -106,18 +222,61 @@ async def upload_document_endpoint(file: UploadFile):
             detail="Unsupported file type. Only PDF and TXT files are allowed"
         )
 
-    try:
-        # Read the file content
-        content_bytes = await file.read()
+    # The form overhead allowance lets a file slightly above the limit through the middleware, so check it again
+    if file.size is not None and file.size > settings.max_upload_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. The maximum upload size is {settings.max_upload_size} bytes"
+        )
 
+    temp_path = None
+
+    try:
         # Data directory to save the data
         data_dir = settings.data_directory_path
         os.makedirs(data_dir, exist_ok=True)
 
-        # Save the file to the data directory
+        # Stream the file to a temporary file in fixed-size chunks, hashing it on the way
+        hasher = hashlib.sha256()
+        file_size = 0
+
+        temp_fd, temp_path = tempfile.mkstemp(dir=data_dir, prefix=".upload-", suffix=file_extension)
+        with os.fdopen(temp_fd, 'wb') as buffer:
+            while chunk := await file.read(settings.upload_chunk_size):
+                file_size += len(chunk)
+                if file_size > settings.max_upload_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File too large. The maximum upload size is {settings.max_upload_size} bytes"
+                    )
+
+                hasher.update(chunk)
+                buffer.write(chunk)
+
+        content_hash = hasher.hexdigest()
+
+        # Skip the ingestion of byte-identical content that was already indexed
+        existing = catalog.get(file.filename)
+        latest_job = job_queue.latest_job(file_name, file_extension)
+        if (
+            existing is not None
+            and existing.get("content_hash") == content_hash
+            and existing["namespace"] == namespace
+            and (latest_job is None or latest_job["status"] != "failed")
+        ):
+            response.status_code = status.HTTP_200_OK
+
+            return {
+                'status': 'success',
+                'message': 'Document is unchanged, indexing was skipped',
+                'document': existing,
+                'job': latest_job
+            }
+
+        # Move the file into place in the data directory atomically
         file_path = os.path.join(data_dir, file.filename)
-        with open(file_path, 'wb') as buffer:
-            buffer.write(content_bytes)
+        os.replace(temp_path, file_path)
+        temp_path = None
 
         # Save the file metadata to a JSON file
         json_path = file_path + ".json"
@@ -125,20 +284,35 @@ async def upload_document_endpoint(file: UploadFile):
             "file_name": file_name,
             "file_extension": file_extension,
             "date": datetime.now().isoformat(),
-            "size": len(content_bytes)
+            "size": file_size,
+            "content_hash": content_hash,
+            "namespace": namespace
         }
         with open(json_path, 'w') as buffer:
             json.dump(metadata, buffer, indent=4)
 
-        # Add the document to the knowledge base
-        add_document(file_path, file_name, file_extension)
+        # A document moved to another namespace is removed from the old one
+        if existing is not None and existing["namespace"] != namespace:
+            delete_document(file.filename, existing["namespace"])
+
+        # Add the document to the catalog
+        catalog.upsert(metadata, "upload")
+
+        # Queue the document for indexing in the knowledge base
+        # Concurrent uploads of the same content join the unfinished job instead of indexing twice
+        job = job_queue.submit(file_path, file_name, file_extension, namespace=namespace, content_hash=content_hash)
 
         return {
             'status': 'success',
-            'message': 'Document uploaded successfully',
-            'document': metadata
+            'message': 'Document is already being indexed, joined the existing job' if job['joined']
+            else 'Document uploaded successfully, indexing has been queued',
+            'document': metadata,
+            'job': job
         }
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         print(f"An error occurred while uploading the document: {e}")
 
@@ -147,29 +321,76 @@ async def upload_document_endpoint(file: UploadFile):
             detail=f'An error occurred while uploading the document: {str(e)}'
         )
 
+    finally:
+        # Remove the temporary file of a rejected or duplicate upload
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@app.get(
+    "/api/jobs",
+    status_code=status.HTTP_200_OK
+)
+async def list_jobs_endpoint(limit: int = 50):
+    """
+    API endpoint to list the most recent ingestion jobs
+    """
+
+    return {
+        'status': 'success',
+        'message': 'Jobs listed successfully',
+        'jobs': job_queue.list_jobs(limit)
+    }
+
+
+@app.get(
+    "/api/jobs/{job_id}",
+    status_code=status.HTTP_200_OK
+)
+async def get_job_endpoint(job_id: str):
+    """
+    API endpoint to get the status, progress and result of an ingestion job
+    """
+
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found"
+        )
+
+    return {
+        'status': 'success',
+        'message': 'Job retrieved successfully',
+        'job': job
+    }
+
 
 @app.post(
     "/api/documents/url",
-    status_code = status.HTTP_201_CREATED
+    status_code = status.HTTP_202_ACCEPTED
 )
-async def upload_url_endpoint(body: UploadUrl, background_tasks: BackgroundTasks):
+async def upload_url_endpoint(body: UploadUrl):
     """
     API endpoint to upload a website url for indexing for RAG knowledge base
     """
 
-    try:
-        if not body.url.startswith(('http://', 'https://')):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid URL format. URL must start with 'http://' or 'https://'"
-            )
+    if not body.url.startswith(('http://', 'https://')):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid URL format. URL must start with 'http://' or 'https://'"
+        )
 
-        # Run the Scrapy crawler in the background
-        background_tasks.add_task(run_scrapy_crawler, body.url)
+    namespace = check_namespace(body.namespace)
+
+    try:
+        # Queue the crawl to run in a separate worker process
+        crawl = crawl_manager.submit(body.url, body.max_pages, body.max_seconds, body.recrawl, namespace)
 
         return {
             "status": "success",
-            "message": f"Crawling started for {body.url} in the background."
+            "message": f"Crawling queued for {body.url}",
+            "crawl": crawl
         }
 
     except Exception as e:
@@ -180,6 +401,45 @@ async def upload_url_endpoint(body: UploadUrl, background_tasks: BackgroundTasks
         )
 
 
+@app.get(
+    "/api/crawls",
+    status_code=status.HTTP_200_OK
+)
+async def list_crawls_endpoint(limit: int = 50):
+    """
+    API endpoint to list the most recent crawls
+    """
+
+    return {
+        'status': 'success',
+        'message': 'Crawls listed successfully',
+        'crawls': crawl_manager.list_crawls(limit)
+    }
+
+
+@app.get(
+    "/api/crawls/{crawl_id}",
+    status_code=status.HTTP_200_OK
+)
+async def get_crawl_endpoint(crawl_id: str):
+    """
+    API endpoint to get the status, progress and result of a crawl
+    """
+
+    crawl = crawl_manager.get(crawl_id)
+    if crawl is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Crawl {crawl_id} not found"
+        )
+
+    return {
+        'status': 'success',
+        'message': 'Crawl retrieved successfully',
+        'crawl': crawl
+    }
+
+
 @app.delete(
     "/api/documents",
     status_code=status.HTTP_200_OK
@@ -190,25 +450,25 @@ async def delete_documents_endpoint(body: DeleteDocument):
     """
 
     try:
-        # List all the files in the knowledge base
-        files = os.listdir(settings.data_directory_path)
+        # Look up the document in the catalog
+        file_name = os.path.basename(body.file_name)
+        file_path = os.path.join(settings.data_directory_path, file_name)
 
-        for file_name in files:
-            if file_name == body.file_name:
-                # Delete the document file
-                file_path = os.path.join(settings.data_directory_path, file_name)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+        document = catalog.get(file_name)
 
-                # Delete the document metadata JSON file
-                json_path = file_path + ".json"
-                if os.path.exists(json_path):
-                    os.remove(json_path)
+        if document is not None or os.path.exists(file_path):
+            # Delete the document file
+            if os.path.exists(file_path):
+                os.remove(file_path)
 
-                # Remove the document from the knowledge base
-                delete_document(body.file_name)
+            # Delete the document metadata JSON file
+            json_path = file_path + ".json"
+            if os.path.exists(json_path):
+                os.remove(json_path)
 
-                break
+            # Remove the document from the catalog and the knowledge base
+            catalog.delete(file_name)
+            delete_document(file_name, document["namespace"] if document else None)
 
         return {
             'status': 'success',
@@ -224,6 +484,88 @@ async def delete_documents_endpoint(body: DeleteDocument):
         )
 
 
+@app.get(
+    "/api/namespaces",
+    status_code=status.HTTP_200_OK
+)
+def list_namespaces_endpoint():
+    """
+    API endpoint to list the namespaces with their number of documents and chunks
+    """
+
+    try:
+        namespaces = [
+            {
+                'namespace': namespace,
+                'documents': catalog.list_documents(page_size=1, namespace=namespace)['total'],
+                'chunks': get_collection(namespace).count()
+            }
+            for namespace in list_namespaces()
+        ]
+
+        return {
+            'status': 'success',
+            'message': 'Namespaces listed successfully',
+            'namespaces': namespaces
+        }
+
+    except Exception as e:
+        print(f"An error occurred while listing namespaces: {e}")
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'An error occurred while listing namespaces: {str(e)}'
+        )
+
+
+@app.delete(
+    "/api/namespaces/{namespace}",
+    status_code=status.HTTP_200_OK
+)
+def delete_namespace_endpoint(namespace: str):
+    """
+    API endpoint to drop a namespace with all its documents by deleting its collection
+    """
+
+    namespace = check_namespace(namespace)
+    if namespace == settings.default_namespace:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The default namespace cannot be dropped"
+        )
+    if namespace not in list_namespaces():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Namespace {namespace} not found"
+        )
+
+    try:
+        # Drop the collection, lexical index and vector mirror of the namespace as a whole
+        drop_namespace(namespace)
+
+        # Remove the documents of the namespace from the catalog and the data directory
+        file_names = catalog.delete_namespace(namespace)
+        for file_name in file_names:
+            file_path = os.path.join(settings.data_directory_path, file_name)
+            for path in (file_path, file_path + ".json"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        return {
+            'status': 'success',
+            'message': f'Namespace {namespace} deleted successfully',
+            'documents_deleted': len(file_names)
+        }
+
+    except Exception as e:
+        print(f"An error occurred while deleting the namespace: {e}")
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'An error occurred while deleting the namespace: {str(e)}'
+        )
+
+
 @app.post(
     "/api/queries/text",
     status_code=status.HTTP_200_OK
@@ -234,23 +576,57 @@ async def queries_text_endpoint(body: TextQuery):
     """
     print(f"Text query received: '{body.query}'")
 
+    namespaces = check_namespaces(body.namespaces)
+
     return StreamingResponse(
-        stream_generator(body.query, False),
+        stream_generator(body.query, False, namespaces, body.file_name),
         media_type='text/plain'
     )
 
 
+@app.post(
+    "/api/queries/batch",
+    status_code=status.HTTP_200_OK
+)
+async def queries_batch_endpoint(body: BatchQuery):
+    """
+    API endpoint to answer many text queries, streaming one JSON line per answer in completion order
+    """
+    print(f"Batch of {len(body.queries)} queries received")
+
+    if not body.queries or len(body.queries) > settings.batch_max_queries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch must contain between 1 and {settings.batch_max_queries} queries"
+        )
+
+    namespaces = check_namespaces(body.namespaces)
+
+    async def ndjson_generator():
+        async for record in answer_batch(body.queries, body.short, namespaces=namespaces):
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(
+        ndjson_generator(),
+        media_type='application/x-ndjson'
+    )
+
+
 @app.post(
     "/api/queries/audio",
     status_code=status.HTTP_200_OK
 )
-async def queries_audio_endpoint(audio_file: UploadFile):
+async def queries_audio_endpoint(audio_file: UploadFile, namespaces: list[str] | None = Query(None)):
     """
     API endpoint to handle RAG queries in audio format
     """
+    namespaces = check_namespaces(namespaces)
+
     try:
         audio_bytes = await audio_file.read()
-        query = speech_to_text(audio_bytes)
+
+        # Decoding, resampling, voice detection and the transcription uploads run off the event loop
+        query = await asyncio.to_thread(speech_to_text, audio_bytes)
         print(f"Audio query received: '{query}'")
 
         if not query or query.isspace():
@@ -260,9 +636,13 @@ async def queries_audio_endpoint(audio_file: UploadFile):
             )
 
         return StreamingResponse(
-            stream_generator(query, True),
+            stream_generator(query, True, namespaces),
             media_type='text/plain'
         )
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         print(f"An error occurred in the audio query view: {e}")
 
@@ -273,23 +653,74 @@ async def queries_audio_endpoint(audio_file: UploadFile):
 
 
 @app.post(
-    "/api/text-to-speech",
+    "/api/queries/audio/speech",
     status_code=status.HTTP_200_OK
 )
-def text_to_speech_endpoint(body: TextQuery):
+async def queries_audio_speech_endpoint(audio_file: UploadFile, namespaces: list[str] | None = Query(None)):
     """
-    API endpoint to convert text to speech using Groq's TTS model
+    API endpoint to answer an audio query with streamed speech, synthesized sentence by sentence
     """
+    namespaces = check_namespaces(namespaces)
 
     try:
-        audio_bytes = text_to_speech(body.query)
+        audio_bytes = await audio_file.read()
+        query = await asyncio.to_thread(speech_to_text, audio_bytes)
+        print(f"Audio query received for speech: '{query}'")
 
-        return Response(
-            content=audio_bytes,
-            media_type='audio/wav',
-            headers={"Content-Disposition": "attachment; filename=output.wav"}
+        if not query or query.isspace():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not transcribe any text from the provided audio file"
+            )
+
+        return StreamingResponse(
+            stream_speech(stream_generator(query, True, namespaces)),
+            media_type='audio/wav'
         )
 
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        print(f"An error occurred in the audio speech query view: {e}")
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An internal error occurred while processing the audio file"
+        )
+
+
+@app.post(
+    "/api/text-to-speech",
+    status_code=status.HTTP_200_OK
+)
+def text_to_speech_endpoint(body: TextQuery, request: Request):
+    """
+    API endpoint to convert text to speech using Groq's TTS model, served from the audio cache when possible
+    """
+
+    try:
+        key = speech_cache_key(body.query)
+        etag = f'"{key}"'
+        headers = {
+            "Content-Disposition": "attachment; filename=output.wav",
+            "ETag": etag,
+            "Cache-Control": "public, max-age=86400"
+        }
+
+        # The audio for a text never changes, so a matching ETag needs no body, even if the file was evicted
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        _, path = cached_text_to_speech(body.query)
+
+        # Send the WAV file as is, with range support so audio players can seek
+        return FileResponse(path, media_type='audio/wav', headers=headers)
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         print(f"An error occurred during text-to-speech conversion: {e}")
 
@@ -297,3 +728,24 @@ def text_to_speech_endpoint(body: TextQuery):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred during text-to-speech conversion"
         )
+
+
+@app.get(
+    "/api/caches",
+    status_code=status.HTTP_200_OK
+)
+def list_caches_endpoint():
+    """
+    API endpoint to get the size and hit-rate counters of the caches
+    """
+
+    return {
+        'status': 'success',
+        'message': 'Cache statistics fetched successfully',
+        'caches': {
+            'embeddings': embedding_cache.stats(),
+            'answers': answer_cache.stats(),
+            'audio': audio_cache.stats(),
+            'coalescing': query_coalescer.stats()
+        }
+    }